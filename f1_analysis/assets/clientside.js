@@ -0,0 +1,105 @@
+// Clientside callbacks of the CLIENTSIDE mode of visual_season_metrics.py: the figures
+// are drawn in the browser from the per-year data of the 'season-data' store.
+(function () {
+    function layout(data, title, xTitle, yTitle) {
+        return {
+            template: data.template,
+            title: {text: title},
+            xaxis: {title: {text: xTitle}},
+            yaxis: {title: {text: yTitle}},
+            barmode: 'relative',
+            legend: {tracegroupgap: 0}
+        };
+    }
+
+    function line(data, x, y, xTitle, yTitle, title) {
+        return {data: [{type: 'scatter', mode: 'lines', x: x, y: y}], layout: layout(data, title, xTitle, yTitle)};
+    }
+
+    function bar(data, x, y, xTitle, yTitle, title) {
+        return {data: [{type: 'bar', x: x, y: y, text: y}], layout: layout(data, title, xTitle, yTitle)};
+    }
+
+    function histogram(data, x, xTitle, title) {
+        return {data: [{type: 'histogram', x: x, nbinsx: 10}], layout: layout(data, title, xTitle, 'count')};
+    }
+
+    // One line per driver (constructor)
+    function lines(data, fight, label, title) {
+        const traces = {};
+        fight.round.forEach(function (round, i) {
+            const name = fight[label][i];
+            traces[name] = traces[name] || {type: 'scatter', mode: 'lines', name: name, x: [], y: []};
+            traces[name].x.push(round);
+            traces[name].y.push(fight.points[i]);
+        });
+        const figure = {data: Object.values(traces), layout: layout(data, title, 'round', 'points')};
+        figure.layout.legend.title = {text: label};
+        return figure;
+    }
+
+    function pie(data, labels, values, title) {
+        if (labels.length === 0) {
+            labels = ['No data'];
+            values = [1];
+        }
+        return {
+            data: [{type: 'pie', labels: labels, values: values}],
+            layout: {template: data.template, title: {text: title}, legend: {tracegroupgap: 0}}
+        };
+    }
+
+    function hasRows(fight) {
+        return Boolean(fight && fight.round.length);
+    }
+
+    const empty = {data: [], layout: {}};
+    const hidden = {display: 'none'};
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        season: {
+            render: function (selectedYear, data) {
+                if (selectedYear === 'all') {
+                    const all = data.all;
+                    return [
+                        line(data, all.year, all.average_gaps, 'year', 'average_gaps', 'Average Gap Over Years'),
+                        line(data, all.year, all.average_position_change, 'year', 'average_position_change',
+                             'Average Position Change Over Years'),
+                        line(data, all.year, all.winner_drivers_gini, 'year', 'winner_drivers_gini',
+                             'Gini Index for Driver Winners'),
+                        line(data, all.year, all.winner_constructors_gini, 'year', 'winner_constructors_gini',
+                             'Gini Index for Constructor Winners'),
+                        empty, empty, empty, empty, empty, empty,
+                        hidden, hidden, hidden, hidden
+                    ];
+                }
+
+                const year = data.years[String(selectedYear)];
+                const races = year.races;
+                // No constructors' championship before 1958: that slot is skipped
+                const driversFight = hasRows(year.drivers_title_fight);
+                const constructorsFight = hasRows(year.constructors_title_fight);
+                return [
+                    pie(data, year.driver_points.driver_id, year.driver_points.points, 'Drivers points'),
+                    pie(data, year.constructor_points.constructor_id, year.constructor_points.points,
+                        'Constructor points'),
+                    bar(data, year.driver_wins.driver, year.driver_wins.wins, 'driver', 'wins', 'Driver Victories'),
+                    bar(data, year.constructor_wins.constructor, year.constructor_wins.wins, 'constructor', 'wins',
+                        'Constructor Victories'),
+                    line(data, races.track_name, races.average_gap, 'track_name', 'average_gap',
+                         'Average Gap by Track'),
+                    histogram(data, races.average_gap, 'average_gap', 'Distribution of Average Gap'),
+                    line(data, races.track_name, races.position_change, 'track_name', 'position_change',
+                         'Position Change by Track'),
+                    histogram(data, races.position_change, 'position_change', 'Distribution of Position Change'),
+                    driversFight ? lines(data, year.drivers_title_fight, 'driver', "Drivers' Title Fight") : empty,
+                    constructorsFight
+                        ? lines(data, year.constructors_title_fight, 'constructor', "Constructors' Title Fight")
+                        : empty,
+                    {}, {}, driversFight || constructorsFight ? {} : hidden,
+                    constructorsFight ? {} : hidden
+                ];
+            }
+        }
+    });
+})();
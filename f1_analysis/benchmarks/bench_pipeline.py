@@ -0,0 +1,239 @@
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from f1_client import ergast_client, ergast_db
+from f1_client.rate_limit import RateLimiter
+from metrics.history_metrics import RESULTS_COLUMNS, compute_races_metrics
+import main_season_races
+import main_season_standings
+from benchmarks.stub_server import StubServer, record_fixtures
+
+# Times the race and standings pipelines stage by stage (fetch, normalize, metrics,
+# csv write) for every season, against a local stub of the API serving recorded
+# responses, and writes a JSON report that can be compared with a previous one.
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+ROOT = BENCHMARKS_DIR.parent
+
+# Recorded responses in the format of f1_client/response_cache.py: a copy of
+# .ergast_cache/ from a normal run, or recorded from the local Ergast database
+# (f1_client/ergast_db.py) when RECORD_FIXTURES is set
+FIXTURES_DIR = BENCHMARKS_DIR / 'fixtures'
+RECORD_FIXTURES = False
+# Simulated network latency of every request
+LATENCY_SECONDS = 0.05
+# Keep Ergast's quotas: off by default, the benchmark measures the pipeline and not the rate limiter
+RATE_LIMITED = False
+# Seasons of the per-stage benchmark, None for every season of the fixtures
+SEASONS = None
+# Also time main_season_races.main and main_season_standings.main end to end
+END_TO_END = True
+# Peak memory of every stage with tracemalloc, which slows down allocation-heavy
+# stages: only compare reports made with the same setting
+TRACE_MEMORY = True
+
+RESULTS_FILE = BENCHMARKS_DIR / 'bench_pipeline.json'
+# Report of a previous run: stages and end-to-end runs slower than it by more than
+# REGRESSION_TOLERANCE (and REGRESSION_MIN_SECONDS) are listed and the script exits with 1
+BASELINE_FILE = None
+REGRESSION_TOLERANCE = 1.25
+REGRESSION_MIN_SECONDS = 0.05
+
+
+def get_peak_mb(memory_before):
+    """Peak of memory allocated since tracemalloc.reset_peak() above memory_before, None without TRACE_MEMORY."""
+    if not tracemalloc.is_tracing():
+        return None
+    return (tracemalloc.get_traced_memory()[1] - memory_before) / 2 ** 20
+
+
+def timed(records, server, pipeline, season, stage, func, *args):
+    """Run func(*args) and record its duration, the requests it made and its peak of allocated memory."""
+    requests_before = server.requests
+    memory_before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    records.append({
+        'pipeline': pipeline,
+        'season': season,
+        'stage': stage,
+        'seconds': seconds,
+        'requests': server.requests - requests_before,
+        'peak_mb': get_peak_mb(memory_before),
+    })
+    return result
+
+
+def bench_races_season(records, server, year, out_dir):
+    races = timed(records, server, 'races', year, 'fetch', main_season_races.fetch_season_results, year)
+    if not races:
+        return 0, 0
+    df_results = timed(records, server, 'races', year, 'normalize', main_season_races.create_results_df, races)
+    df_metrics = timed(records, server, 'races', year, 'metrics', compute_races_metrics, df_results[RESULTS_COLUMNS])
+    timed(records, server, 'races', year, 'write', df_metrics.to_csv, out_dir / f'races_{year}.csv')
+    return len(races), len(df_results)
+
+
+def fetch_standings(year):
+    return ergast_client.get_driver_standings(year), ergast_client.get_constructor_standings(year)
+
+
+def normalize_standings(year, driver_standings, constructor_standings):
+    return (
+        main_season_standings.create_driver_standings(year, driver_standings) if driver_standings else pd.DataFrame(),
+        main_season_standings.create_constructor_standings(year, constructor_standings) if constructor_standings else pd.DataFrame()
+    )
+
+
+def write_standings(year, out_dir, df_drivers, df_constructors):
+    df_drivers.to_csv(out_dir / f'drivers_standings_{year}.csv')
+    df_constructors.to_csv(out_dir / f'constructors_standings_{year}.csv')
+
+
+def bench_standings_season(records, server, year, out_dir):
+    standings = timed(records, server, 'standings', year, 'fetch', fetch_standings, year)
+    dfs = timed(records, server, 'standings', year, 'normalize', normalize_standings, year, *standings)
+    timed(records, server, 'standings', year, 'write', write_standings, year, out_dir, *dfs)
+
+
+def bench_main(server, work_dir, module):
+    """End-to-end run of a main_* script in work_dir, where it writes all of its files."""
+    requests_before = server.requests
+    memory_before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        start = time.perf_counter()
+        module.main(incremental=False)
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    requests = server.requests - requests_before
+    return {
+        'seconds': seconds,
+        'requests': requests,
+        'requests_per_second': requests / seconds,
+        'peak_mb': get_peak_mb(memory_before),
+    }
+
+
+def summarize(records):
+    df = pd.DataFrame(records)
+    totals = df.groupby(['pipeline', 'stage'], sort=False).agg(
+        seconds=('seconds', 'sum'), requests=('requests', 'sum'), peak_mb=('peak_mb', 'max')
+    )
+    totals = totals.astype(object).where(totals.notna(), None)
+    return {f'{pipeline}.{stage}': row for (pipeline, stage), row in totals.to_dict('index').items()}
+
+
+def find_regressions(report, baseline):
+    """Timings of `report` slower than the same timings of `baseline` beyond the tolerance."""
+    regressions = []
+    for section in ('totals', 'end_to_end'):
+        for name, entry in report[section].items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            if (entry['seconds'] > before['seconds'] * REGRESSION_TOLERANCE
+                    and entry['seconds'] - before['seconds'] > REGRESSION_MIN_SECONDS):
+                regressions.append({'name': f'{section}.{name}', 'seconds': entry['seconds'], 'baseline_seconds': before['seconds']})
+    return regressions
+
+
+def main():
+    if RECORD_FIXTURES:
+        ergast_db.DB_PATH = ROOT / ergast_db.DB_PATH
+        ergast_db.DUMP_DIR = ROOT / ergast_db.DUMP_DIR
+        record_fixtures(FIXTURES_DIR, SEASONS)
+
+    # Every request goes to the stub, never to the cache or the real API
+    ergast_client.CACHE_MODE = 'off'
+    if not RATE_LIMITED:
+        ergast_client._rate_limiter = RateLimiter(per_second=10 ** 6, per_hour=10 ** 9)
+
+    records = []
+    if TRACE_MEMORY:
+        tracemalloc.start()
+    with StubServer(FIXTURES_DIR, LATENCY_SECONDS) as server, tempfile.TemporaryDirectory() as work_dir:
+        ergast_client.BASE_URL = server.base_url
+        out_dir = Path(work_dir)
+        seasons = SEASONS or ergast_client.get_available_seasons()
+
+        n_races = n_rows = 0
+        for year in seasons:
+            races, rows = bench_races_season(records, server, year, out_dir)
+            bench_standings_season(records, server, year, out_dir)
+            n_races += races
+            n_rows += rows
+
+        end_to_end = {}
+        if END_TO_END:
+            for module in (main_season_races, main_season_standings):
+                end_to_end[module.__name__] = bench_main(server, out_dir, module)
+        misses = server.misses
+    tracemalloc.stop()
+
+    totals = summarize(records)
+    races_seconds = sum(entry['seconds'] for name, entry in totals.items() if name.startswith('races.'))
+    fetch_seconds = sum(entry['seconds'] for name, entry in totals.items() if name.endswith('.fetch'))
+    fetch_requests = sum(entry['requests'] for name, entry in totals.items() if name.endswith('.fetch'))
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__},
+        'config': {
+            'latency_seconds': LATENCY_SECONDS,
+            'rate_limited': RATE_LIMITED,
+            'trace_memory': TRACE_MEMORY,
+            'seasons': [int(year) for year in seasons],
+        },
+        'stages': records,
+        'totals': totals,
+        'throughput': {
+            'races_per_second': n_races / races_seconds if races_seconds else None,
+            'result_rows_per_second': n_rows / races_seconds if races_seconds else None,
+            'requests_per_second': fetch_requests / fetch_seconds if fetch_seconds else None,
+        },
+        'end_to_end': end_to_end,
+        'missing_fixtures': misses,
+        # ru_maxrss is in kB on Linux
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+    if BASELINE_FILE is not None:
+        with open(BASELINE_FILE) as f:
+            report['regressions'] = find_regressions(report, json.load(f))
+
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    print(f"{len(seasons)} seasons, {n_races} races, {fetch_requests} requests ({misses} without fixture)")
+    for name, entry in totals.items():
+        peak = f"  peak {entry['peak_mb']:7.1f} MB" if TRACE_MEMORY else ""
+        print(f"{name:<22} {entry['seconds']:8.3f}s{peak}")
+    for name, entry in end_to_end.items():
+        print(f"{name:<22} {entry['seconds']:8.3f}s  {entry['requests_per_second']:.1f} requests/s")
+    print(f"max RSS {report['max_rss_mb']:.0f} MB, report written to {RESULTS_FILE}")
+
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['name']}: {regression['seconds']:.3f}s (baseline {regression['baseline_seconds']:.3f}s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
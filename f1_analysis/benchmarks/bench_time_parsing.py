@@ -0,0 +1,68 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from metrics.race_metrics import convert_to_timedelta_column, parse_race_times
+from f1_client import ergast_db
+
+# Full-history race times: the local Ergast database when there is one (see f1_client/ergast_db.py),
+# otherwise a synthetic history with the same size and mix of formats
+N_RACES = 1125
+DRIVERS_PER_RACE = 23
+
+
+def load_history_times():
+    db_path = Path(__file__).resolve().parents[1] / ergast_db.DB_PATH
+    if db_path.exists():
+        ergast_db.DB_PATH = db_path
+        df = pd.read_sql(
+            "SELECT raceId AS race_id, time FROM results ORDER BY raceId, positionOrder",
+            ergast_db.get_connection()
+        )
+        return df, 'Ergast database'
+
+    rng = np.random.default_rng(0)
+    times = []
+    for race_id in range(N_RACES):
+        winner_ms = rng.integers(5_000_000, 7_000_000)
+        h, rem = divmod(winner_ms, 3_600_000)
+        m, rem = divmod(rem, 60_000)
+        times.append((race_id, f"{h}:{m:02d}:{rem / 1000:06.3f}"))
+        gaps = np.cumsum(rng.integers(100, 15_000, DRIVERS_PER_RACE - 1))
+        for i, gap in enumerate(gaps):
+            if i > 12:
+                times.append((race_id, None))
+            elif gap >= 60_000:
+                times.append((race_id, f"+{gap // 60_000}:{gap % 60_000 / 1000:06.3f}"))
+            else:
+                times.append((race_id, f"+{gap / 1000:.3f}"))
+    return pd.DataFrame(times, columns=['race_id', 'time']), 'synthetic history'
+
+
+def main():
+    df, source = load_history_times()
+    print(f"{len(df)} times from {df['race_id'].nunique()} races ({source})")
+
+    start = time.perf_counter()
+    per_race = [convert_to_timedelta_column(race['time'].tolist()) for _, race in df.groupby('race_id', sort=False)]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = parse_race_times(df['time'], race_ids=df['race_id'])
+    vectorized_seconds = time.perf_counter() - start
+
+    legacy = pd.concat(per_race, ignore_index=True)
+    assert (legacy.dt.total_seconds().fillna(-1).to_numpy() == vectorized.dt.total_seconds().fillna(-1).to_numpy()).all()
+
+    print(f"convert_to_timedelta_column per race: {legacy_seconds:.3f}s")
+    print(f"parse_race_times on the whole column: {vectorized_seconds:.3f}s")
+    print(f"speedup: {legacy_seconds / vectorized_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
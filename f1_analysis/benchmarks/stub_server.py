@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from f1_client import ergast_client, ergast_db
+from f1_client.response_cache import ResponseCache
+
+# Local stand-in for the Ergast API: answers with recorded responses (the on-disk
+# format of f1_client/response_cache.py, keyed by the real Ergast URL) after
+# `latency` seconds, 404 for anything that was not recorded.
+ERGAST_ORIGIN = "{0.scheme}://{0.netloc}".format(urlsplit(ergast_client.BASE_URL))
+API_PATH = urlsplit(ergast_client.BASE_URL).path
+
+
+class StubServer:
+    """Serve the fixtures of `fixtures_dir` on localhost from a background thread.
+
+        with StubServer(fixtures_dir, latency=0.05) as server:
+            ergast_client.BASE_URL = server.base_url
+    """
+
+    def __init__(self, fixtures_dir, latency=0.0):
+        self.cache = ResponseCache(fixtures_dir)
+        self.latency = latency
+        self.requests = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{API_PATH}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency)
+                entry = server.cache.load(ERGAST_ORIGIN + self.path)
+                with server.lock:
+                    server.requests += 1
+                    server.misses += entry is None
+                if entry is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(entry['data']).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+
+def _paginate(races, key, limit, offset):
+    """One page of a paginated Ergast response: `limit` rows of `key`, races split across pages."""
+    rows = [(race, row) for race in races for row in race[key]]
+    page = []
+    for race, row in rows[offset:offset + limit]:
+        if not page or page[-1]['round'] != race['round']:
+            page.append({**{k: v for k, v in race.items() if k != key}, key: []})
+        page[-1][key].append(row)
+    return {'MRData': {'limit': str(limit), 'offset': str(offset), 'total': str(len(rows)), 'RaceTable': {'Races': page}}}
+
+
+def record_fixtures(fixtures_dir, years=None):
+    """Record, from the local Ergast database, every response the race and standings pipelines ask for.
+
+    With `years` the recorded API only has those seasons.
+    """
+    cache = ResponseCache(fixtures_dir)
+    base_url = ERGAST_ORIGIN + API_PATH
+    seasons = years or ergast_db.get_available_seasons()
+    cache.save(f"{base_url}/seasons.json?limit=1000",
+               {'MRData': {'SeasonTable': {'Seasons': [{'season': str(year)} for year in seasons]}}})
+
+    for year in seasons:
+        cache.save(f"{base_url}/{year}.json", {'MRData': {'RaceTable': {'Races': ergast_db.get_season_races(year)}}})
+
+        races = list(ergast_db.iter_season_results(year))
+        page_size = ergast_client.RESULTS_PAGE_SIZE
+        for offset in range(0, max(sum(len(race['Results']) for race in races), 1), page_size):
+            cache.save(f"{base_url}/{year}/results.json?limit={page_size}&offset={offset}",
+                       _paginate(races, 'Results', page_size, offset))
+
+        for endpoint, key, standings in (
+            ('driverStandings', 'DriverStandings', ergast_db.get_driver_standings(year)),
+            ('constructorStandings', 'ConstructorStandings', ergast_db.get_constructor_standings(year)),
+        ):
+            standings_lists = [{'season': str(year), key: standings}] if standings else []
+            cache.save(f"{base_url}/{year}/{endpoint}.json", {'MRData': {'StandingsTable': {'StandingsLists': standings_lists}}})
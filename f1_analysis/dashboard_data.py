@@ -0,0 +1,121 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.feather as feather
+
+# Data access shared by visual_season_metrics.py and tracks/visual_track_metrics.py.
+# Each csv written by the main_* scripts gets a typed Feather copy next to it
+# (rebuilt whenever the csv is newer), which is memory-mapped instead of parsed.
+DATA_DIR = Path(__file__).resolve().parent
+
+TABLES = {
+    'races_metrics': 'df_races_metrics.csv',
+    'season_metrics': 'df_season_metrics.csv',
+    'drivers_standings': 'df_drivers_standings.csv',
+    'constructors_standings': 'df_constructors_standings.csv',
+    # Written by main_season_standings.py once the results store exists
+    'drivers_progression': 'df_drivers_progression.csv',
+    'constructors_progression': 'df_constructors_progression.csv',
+}
+
+CATEGORICAL_COLUMNS = {
+    'races_metrics': ['track_id', 'track_name', 'winner', 'constructor'],
+    'season_metrics': [],
+    'drivers_standings': ['driver_id', 'nationality'],
+    'constructors_standings': ['constructor_id', 'nationality'],
+    'drivers_progression': ['driver_id', 'driver'],
+    'constructors_progression': ['constructor_id', 'constructor'],
+}
+
+
+def _csv_path(name):
+    return DATA_DIR / TABLES[name]
+
+
+def _feather_path(name):
+    return _csv_path(name).with_suffix('.feather')
+
+
+def has_table(name):
+    return _csv_path(name).exists()
+
+
+def get_table_version(name):
+    """mtime of the csv, None when it has not been written yet."""
+    return os.stat(_csv_path(name)).st_mtime_ns if has_table(name) else None
+
+
+def get_data_version(names=TABLES):
+    """Changes whenever one of the csvs of `names` is rewritten."""
+    return tuple(get_table_version(name) for name in names)
+
+
+def read_csv_table(name):
+    df = pd.read_csv(_csv_path(name), index_col=0)
+    return df.astype({column: 'category' for column in CATEGORICAL_COLUMNS[name]})
+
+
+def convert_table(name):
+    """Write the typed Feather copy of a csv, uncompressed so that it can be memory-mapped."""
+    df = read_csv_table(name).reset_index(drop=True)
+    tmp_path = _feather_path(name).with_suffix('.tmp')
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    tmp_path.replace(_feather_path(name))
+    return df
+
+
+@lru_cache(maxsize=len(TABLES))
+def _load_table(name, version):
+    if version is None:
+        return None
+    feather_path = _feather_path(name)
+    if feather_path.exists() and feather_path.stat().st_mtime_ns >= version:
+        return feather.read_feather(feather_path, memory_map=True)
+    try:
+        return convert_table(name)
+    except OSError:
+        # Read-only deployment: fall back to the csv
+        return read_csv_table(name).reset_index(drop=True)
+
+
+def load_table(name):
+    """A table of TABLES, loaded on first use and again only when its csv changes (None if there is no csv)."""
+    return _load_table(name, get_table_version(name))
+
+
+@lru_cache(maxsize=2 * len(TABLES))
+def _get_index(name, column, version):
+    return _load_table(name, version).groupby(column, observed=True).indices
+
+
+def get_index(name, column):
+    """{value of column: row positions} of a table, e.g. the rows of every year."""
+    return _get_index(name, column, get_table_version(name))
+
+
+def get_rows(name, column, value):
+    """Rows of a table where column == value, from the index instead of a full scan."""
+    df = load_table(name)
+    return df.iloc[get_index(name, column).get(value, [])]
+
+
+def get_year_rows(name, year):
+    return get_rows(name, 'year', year)
+
+
+def get_track_rows(track_name):
+    return get_rows('races_metrics', 'track_name', track_name)
+
+
+def to_columns(df, columns):
+    """{column: values} with None for missing values, the compact form sent to the browser."""
+    return {column: df[column].astype(object).where(df[column].notna(), None).tolist() for column in columns}
+
+
+def get_counts(series, name):
+    """Wins per value, most wins first and ties in order of appearance."""
+    counts = series.astype(object).value_counts().reset_index()
+    counts.columns = [name, 'wins']
+    return counts
@@ -1,41 +1,188 @@
+import time
+
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from f1_client.response_cache import ResponseCache, CacheMissError
+from f1_client.rate_limit import RateLimiter
 
 BASE_URL = "https://ergast.com/api/f1"
 
+# 'record': serve from the cache when fresh, otherwise fetch and store
+# 'replay': serve only from the cache, never touch the network
+# 'off': always fetch, never store
+CACHE_MODE = 'record'
+CACHE_DIR = ".ergast_cache"
+CURRENT_SEASON_TTL = 6 * 3600
 
-def get_available_seasons():
-    url = "https://ergast.com/api/f1/seasons.json?limit=1000"
-    response = requests.get(url)
+# Ergast quotas: bursts of 4 requests per second, 500 requests per hour
+RATE_LIMIT_PER_SECOND = 4
+RATE_LIMIT_PER_HOUR = 500
+MAX_RETRIES = 5
+RETRY_BACKOFF = 1.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Ergast serves up to 1000 rows per page, a whole season is 1 to 3 pages
+RESULTS_PAGE_SIZE = 1000
+# A race is about 1000 to 1500 lap timings
+LAPS_PAGE_SIZE = 1000
+
+_session = None
+_rate_limiter = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        # Only connection errors are retried here, HTTP errors go through fetch() and the rate limiter
+        retries = Retry(total=3, backoff_factor=0.5, respect_retry_after_header=False)
+        _session = requests.Session()
+        _session.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=16))
+        _session.mount("http://", HTTPAdapter(max_retries=retries, pool_maxsize=16))
+    return _session
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(per_second=RATE_LIMIT_PER_SECOND, per_hour=RATE_LIMIT_PER_HOUR)
+    return _rate_limiter
+
+
+def fetch(url, headers=None):
+    """Rate-limited GET, retried with exponential backoff on 429 and 5xx."""
+    for attempt in range(MAX_RETRIES + 1):
+        get_rate_limiter().acquire()
+        response = get_session().get(url, headers=headers)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+
+        retry_after = response.headers.get('Retry-After')
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else RETRY_BACKOFF * 2 ** attempt
+        print(f"{response.status_code} from {url}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def get_json(url):
+    if CACHE_MODE == 'off':
+        response = fetch(url)
+        response.raise_for_status()
+        return response.json()
+
+    cache = ResponseCache(CACHE_DIR, ttl=CURRENT_SEASON_TTL)
+    entry = cache.load(url)
+
+    if CACHE_MODE == 'replay':
+        if entry is None:
+            raise CacheMissError(f"{url} is not in the response cache ({cache.cache_dir})")
+        return entry['data']
+
+    if entry is not None and cache.is_fresh(entry):
+        return entry['data']
+
+    headers = {'If-None-Match': entry['etag']} if entry and entry['etag'] else {}
+    response = fetch(url, headers=headers)
+    if response.status_code == 304:
+        return cache.touch(entry)['data']
+
+    response.raise_for_status()
     data = response.json()
+    cache.save(url, data, response.headers.get('ETag'))
+    return data
+
+
+def get_available_seasons():
+    url = f"{BASE_URL}/seasons.json?limit=1000"
+    data = get_json(url)
     seasons = [int(s['season']) for s in data['MRData']['SeasonTable']['Seasons']]
     return seasons
 
 def get_season_races(year):
     url = f"{BASE_URL}/{year}.json"
-    response = requests.get(url)
-    data = response.json()
+    data = get_json(url)
     races = data['MRData']['RaceTable']['Races']
     return races
 
 def get_race_results(year, round_number):
     url = f"{BASE_URL}/{year}/{round_number}/results.json"
-    response = requests.get(url)
-    data = response.json()
+    data = get_json(url)
     results = data['MRData']['RaceTable']['Races'][0]['Results']
     return results
 
+def iter_season_results(year, page_size=RESULTS_PAGE_SIZE):
+    """Yield every race of a season with its full 'Results', fetched a few large pages at a time."""
+    race = None
+    offset = 0
+    while True:
+        url = f"{BASE_URL}/{year}/results.json?limit={page_size}&offset={offset}"
+        data = get_json(url)['MRData']
+
+        for page_race in data['RaceTable']['Races']:
+            # A race can be split across two pages
+            if race is not None and page_race['round'] == race['round']:
+                race['Results'].extend(page_race['Results'])
+                continue
+            if race is not None:
+                yield race
+            race = page_race
+
+        offset += page_size
+        if offset >= int(data['total']):
+            break
+
+    if race is not None:
+        yield race
+
+def iter_results(years, page_size=RESULTS_PAGE_SIZE):
+    for year in years:
+        yield from iter_season_results(year, page_size)
+
+def iter_race_laps(year, round_number, page_size=LAPS_PAGE_SIZE):
+    """Yield the 'Laps' of a race ({'number', 'Timings'}) one page at a time, in lap order."""
+    lap = None
+    offset = 0
+    while True:
+        url = f"{BASE_URL}/{year}/{round_number}/laps.json?limit={page_size}&offset={offset}"
+        data = get_json(url)['MRData']
+        races = data['RaceTable']['Races']
+
+        for page_lap in races[0]['Laps'] if races else []:
+            # A lap can be split across two pages
+            if lap is not None and page_lap['number'] == lap['number']:
+                lap['Timings'].extend(page_lap['Timings'])
+                continue
+            if lap is not None:
+                yield lap
+            lap = page_lap
+
+        offset += page_size
+        if offset >= int(data['total']):
+            break
+
+    if lap is not None:
+        yield lap
+
+def get_race_pitstops(year, round_number):
+    url = f"{BASE_URL}/{year}/{round_number}/pitstops.json?limit=1000"
+    data = get_json(url)
+    races = data['MRData']['RaceTable']['Races']
+    return races[0]['PitStops'] if races else []
+
 def get_driver_standings(year):
     url = f"{BASE_URL}/{year}/driverStandings.json"
-    response = requests.get(url)
-    data = response.json()
-    standings = data['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings']
-    return standings
+    data = get_json(url)
+
+    standings_lists = data['MRData']['StandingsTable']['StandingsLists']
+    if not standings_lists:
+        print(f"No driver standings for year {year}")
+        return []
+
+    return standings_lists[0]['DriverStandings']
 
 def get_constructor_standings(year):
     url = f"{BASE_URL}/{year}/constructorStandings.json"
-    response = requests.get(url)
-    data = response.json()
+    data = get_json(url)
 
     standings_lists = data['MRData']['StandingsTable']['StandingsLists']
     if not standings_lists:
@@ -43,9 +190,3 @@ def get_constructor_standings(year):
         return []
 
     return standings_lists[0]['ConstructorStandings']
-
-    url = f"{BASE_URL}/{year}/constructorStandings.json"
-    response = requests.get(url)
-    data = response.json()
-    standings = data['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings']
-    return standings
\ No newline at end of file
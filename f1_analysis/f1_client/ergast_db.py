@@ -0,0 +1,336 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+# Local replacement for ergast_client: the same getters, answered from the Ergast
+# CSV database dump (f1db_csv) loaded into an indexed SQLite file.
+DUMP_DIR = Path("ergast_dump")
+DB_PATH = Path("ergast.db")
+
+# Integer key columns, everything else is kept as text like the API does
+DUMP_TABLES = {
+    'seasons': ['year'],
+    'circuits': ['circuitId'],
+    'races': ['raceId', 'year', 'round', 'circuitId'],
+    'drivers': ['driverId'],
+    'constructors': ['constructorId'],
+    'status': ['statusId'],
+    'results': ['resultId', 'raceId', 'driverId', 'constructorId', 'positionOrder', 'statusId'],
+    'driver_standings': ['raceId', 'driverId'],
+    'constructor_standings': ['raceId', 'constructorId'],
+    'lap_times': ['raceId', 'driverId', 'lap', 'position'],
+    'pit_stops': ['raceId', 'driverId', 'stop', 'lap'],
+}
+
+INDEXES = [
+    "CREATE UNIQUE INDEX idx_races_year_round ON races (year, round)",
+    "CREATE INDEX idx_results_race ON results (raceId, positionOrder)",
+    "CREATE INDEX idx_driver_standings_race ON driver_standings (raceId)",
+    "CREATE INDEX idx_constructor_standings_race ON constructor_standings (raceId)",
+    "CREATE INDEX idx_lap_times_race ON lap_times (raceId, lap, position)",
+    "CREATE INDEX idx_pit_stops_race ON pit_stops (raceId, stop)",
+]
+
+_connection = None
+
+
+def build_database(dump_dir=None, db_path=None):
+    """Load the Ergast CSV dump into a fresh SQLite database, DUMP_DIR into DB_PATH by default."""
+    # Looked up at call time, DUMP_DIR and DB_PATH can be overridden after import
+    dump_dir, db_path = Path(dump_dir or DUMP_DIR), Path(db_path or DB_PATH)
+    if db_path.exists():
+        db_path.unlink()
+
+    con = sqlite3.connect(db_path)
+    for table, int_columns in DUMP_TABLES.items():
+        df = pd.read_csv(dump_dir / f"{table}.csv", dtype=str, na_values=['\\N'], keep_default_na=False)
+        df[int_columns] = df[int_columns].astype(int)
+        df.to_sql(table, con, index=False)
+        print(f"Loaded {len(df)} rows into {table}")
+
+    for index in INDEXES:
+        con.execute(index)
+    con.commit()
+    con.close()
+
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        if not DB_PATH.exists():
+            build_database(DUMP_DIR, DB_PATH)
+        _connection = sqlite3.connect(DB_PATH)
+        _connection.row_factory = sqlite3.Row
+    return _connection
+
+
+def _drop_missing(d):
+    """The API leaves out fields it has no value for instead of sending nulls."""
+    return {k: v for k, v in d.items() if v is not None}
+
+
+def _driver(row):
+    return _drop_missing({
+        'driverId': row['driverRef'],
+        'permanentNumber': row['driver_number'],
+        'code': row['code'],
+        'url': row['driver_url'],
+        'givenName': row['forename'],
+        'familyName': row['surname'],
+        'dateOfBirth': row['dob'],
+        'nationality': row['driver_nationality'],
+    })
+
+
+def _constructor(row):
+    return {
+        'constructorId': row['constructorRef'],
+        'url': row['constructor_url'],
+        'name': row['constructor_name'],
+        'nationality': row['constructor_nationality'],
+    }
+
+
+def _race(row):
+    return _drop_missing({
+        'season': str(row['year']),
+        'round': str(row['round']),
+        'url': row['url'],
+        'raceName': row['name'],
+        'Circuit': {
+            'circuitId': row['circuitRef'],
+            'url': row['circuit_url'],
+            'circuitName': row['circuit_name'],
+            'Location': {
+                'lat': row['lat'],
+                'long': row['lng'],
+                'locality': row['location'],
+                'country': row['country'],
+            }
+        },
+        'date': row['date'],
+        'time': f"{row['time']}Z" if row['time'] else None,
+    })
+
+
+def _result(row):
+    result = {
+        'number': row['number'],
+        'position': str(row['positionOrder']),
+        'positionText': row['positionText'],
+        'points': row['points'],
+        'Driver': _driver(row),
+        'Constructor': _constructor(row),
+        'grid': row['grid'],
+        'laps': row['laps'],
+        'status': row['status'],
+    }
+    if row['time']:
+        result['Time'] = {'millis': row['milliseconds'], 'time': row['time']}
+    if row['fastestLap']:
+        result['FastestLap'] = _drop_missing({
+            'rank': row['rank'],
+            'lap': row['fastestLap'],
+            'Time': {'time': row['fastestLapTime']},
+            'AverageSpeed': {'units': 'kph', 'speed': row['fastestLapSpeed']} if row['fastestLapSpeed'] else None,
+        })
+    return _drop_missing(result)
+
+
+RACE_COLUMNS = """
+    r.raceId, r.year, r.round, r.url, r.name, r.date, r.time,
+    c.circuitRef, c.url AS circuit_url, c.name AS circuit_name, c.lat, c.lng, c.location, c.country
+"""
+
+DRIVER_COLUMNS = """
+    d.driverRef, d.number AS driver_number, d.code, d.url AS driver_url, d.forename, d.surname, d.dob,
+    d.nationality AS driver_nationality
+"""
+
+CONSTRUCTOR_COLUMNS = """
+    k.constructorRef, k.url AS constructor_url, k.name AS constructor_name,
+    k.nationality AS constructor_nationality
+"""
+
+
+def get_available_seasons():
+    rows = get_connection().execute("SELECT year FROM seasons ORDER BY year")
+    return [row['year'] for row in rows]
+
+
+def get_season_races(year):
+    rows = get_connection().execute(f"""
+        SELECT {RACE_COLUMNS}
+        FROM races r JOIN circuits c ON c.circuitId = r.circuitId
+        WHERE r.year = ?
+        ORDER BY r.round
+    """, (year,))
+    return [_race(row) for row in rows]
+
+
+RESULT_COLUMNS = f"""
+    res.number, res.positionOrder, res.positionText, res.points, res.grid, res.laps,
+    res.time, res.milliseconds, res.fastestLap, res.rank, res.fastestLapTime,
+    res.fastestLapSpeed, s.status, {DRIVER_COLUMNS}, {CONSTRUCTOR_COLUMNS}
+"""
+
+RESULT_JOINS = """
+    JOIN races r ON r.raceId = res.raceId
+    JOIN drivers d ON d.driverId = res.driverId
+    JOIN constructors k ON k.constructorId = res.constructorId
+    JOIN status s ON s.statusId = res.statusId
+"""
+
+
+def get_race_results(year, round_number):
+    rows = get_connection().execute(f"""
+        SELECT {RESULT_COLUMNS}
+        FROM results res {RESULT_JOINS}
+        WHERE r.year = ? AND r.round = ?
+        ORDER BY res.positionOrder
+    """, (year, int(round_number)))
+    return [_result(row) for row in rows]
+
+
+def iter_season_results(year, page_size=None):
+    """Yield every race of a season with its full 'Results', like ergast_client.iter_season_results.
+
+    page_size is accepted for compatibility, the whole season is a single query.
+    """
+    races = {race['round']: race for race in get_season_races(year)}
+    rows = get_connection().execute(f"""
+        SELECT r.round AS race_round, {RESULT_COLUMNS}
+        FROM results res {RESULT_JOINS}
+        WHERE r.year = ?
+        ORDER BY r.round, res.positionOrder
+    """, (year,))
+
+    race = None
+    for row in rows:
+        if race is None or race['round'] != str(row['race_round']):
+            if race is not None:
+                yield race
+            race = {**races[str(row['race_round'])], 'Results': []}
+        race['Results'].append(_result(row))
+
+    if race is not None:
+        yield race
+
+
+def iter_results(years, page_size=None):
+    for year in years:
+        yield from iter_season_results(year, page_size)
+
+
+def iter_race_laps(year, round_number, page_size=None):
+    """Yield the 'Laps' of a race like ergast_client.iter_race_laps, in a single query."""
+    rows = get_connection().execute("""
+        SELECT lt.lap, lt.position, lt.time, d.driverRef
+        FROM lap_times lt
+        JOIN races r ON r.raceId = lt.raceId
+        JOIN drivers d ON d.driverId = lt.driverId
+        WHERE r.year = ? AND r.round = ?
+        ORDER BY lt.lap, lt.position
+    """, (year, int(round_number)))
+
+    lap = None
+    for row in rows:
+        if lap is None or lap['number'] != str(row['lap']):
+            if lap is not None:
+                yield lap
+            lap = {'number': str(row['lap']), 'Timings': []}
+        lap['Timings'].append({'driverId': row['driverRef'], 'position': str(row['position']), 'time': row['time']})
+
+    if lap is not None:
+        yield lap
+
+
+def get_race_pitstops(year, round_number):
+    rows = get_connection().execute("""
+        SELECT ps.stop, ps.lap, ps.time, ps.duration, d.driverRef
+        FROM pit_stops ps
+        JOIN races r ON r.raceId = ps.raceId
+        JOIN drivers d ON d.driverId = ps.driverId
+        WHERE r.year = ? AND r.round = ?
+        ORDER BY ps.time, ps.driverId
+    """, (year, int(round_number)))
+    return [{
+        'driverId': row['driverRef'],
+        'lap': str(row['lap']),
+        'stop': str(row['stop']),
+        'time': row['time'],
+        'duration': row['duration'],
+    } for row in rows]
+
+
+def _last_standings_race(year, table):
+    row = get_connection().execute(f"""
+        SELECT r.raceId
+        FROM races r
+        WHERE r.year = ? AND EXISTS (SELECT 1 FROM {table} t WHERE t.raceId = r.raceId)
+        ORDER BY r.round DESC
+        LIMIT 1
+    """, (year,)).fetchone()
+    return row['raceId'] if row else None
+
+
+def get_driver_standings(year):
+    race_id = _last_standings_race(year, 'driver_standings')
+    if race_id is None:
+        return []
+
+    con = get_connection()
+
+    # Every constructor a driver raced for that season, in order of first appearance
+    constructors = {}
+    for row in con.execute(f"""
+        SELECT res.driverId, {CONSTRUCTOR_COLUMNS}
+        FROM results res
+        JOIN races r ON r.raceId = res.raceId
+        JOIN constructors k ON k.constructorId = res.constructorId
+        WHERE r.year = ?
+        GROUP BY res.driverId, res.constructorId
+        ORDER BY MIN(r.round), MIN(res.resultId)
+    """, (year,)):
+        constructors.setdefault(row['driverId'], []).append(_constructor(row))
+
+    rows = con.execute(f"""
+        SELECT ds.driverId, ds.position, ds.positionText, ds.points, ds.wins, {DRIVER_COLUMNS}
+        FROM driver_standings ds
+        JOIN drivers d ON d.driverId = ds.driverId
+        WHERE ds.raceId = ?
+        ORDER BY CAST(ds.position AS INTEGER)
+    """, (race_id,))
+
+    return [_drop_missing({
+        'position': row['position'],
+        'positionText': row['positionText'],
+        'points': row['points'],
+        'wins': row['wins'],
+        'Driver': _driver(row),
+        'Constructors': constructors.get(row['driverId'], []),
+    }) for row in rows]
+
+
+def get_constructor_standings(year):
+    race_id = _last_standings_race(year, 'constructor_standings')
+    if race_id is None:
+        print(f"No constructor standings for year {year}")
+        return []
+
+    rows = get_connection().execute(f"""
+        SELECT cs.position, cs.positionText, cs.points, cs.wins, {CONSTRUCTOR_COLUMNS}
+        FROM constructor_standings cs
+        JOIN constructors k ON k.constructorId = cs.constructorId
+        WHERE cs.raceId = ?
+        ORDER BY CAST(cs.position AS INTEGER)
+    """, (race_id,))
+
+    return [_drop_missing({
+        'position': row['position'],
+        'positionText': row['positionText'],
+        'points': row['points'],
+        'wins': row['wins'],
+        'Constructor': _constructor(row),
+    }) for row in rows]
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` requests in a burst, refilled at `rate` per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self.tokens -= 1
+
+
+class SlidingWindow:
+    """At most `limit` requests in any `period` seconds, from the times of the requests made in the last one.
+
+    Unlike a token bucket it has no initial burst on top of the refill: a fresh
+    limiter lets exactly `limit` requests through in the first period.
+    """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.times = deque()
+
+    def wait_time(self, now):
+        """Seconds until the oldest request of the window leaves it (0 if there is room now)."""
+        while self.times and self.times[0] <= now - self.period:
+            self.times.popleft()
+        if len(self.times) < self.limit:
+            return 0
+        return self.times[0] + self.period - now
+
+    def take(self, now):
+        self.times.append(now)
+
+
+class RateLimiter:
+    """Thread-safe limiter enforcing a per-second and a per-hour quota at the same time."""
+
+    def __init__(self, per_second=4, per_hour=500):
+        self.buckets = [
+            TokenBucket(rate=per_second, capacity=per_second),
+            # A full bucket of per_hour tokens refilling per_hour an hour would let twice the quota through the first hour
+            SlidingWindow(limit=per_hour, period=3600),
+        ]
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max(bucket.wait_time(now) for bucket in self.buckets)
+                if wait == 0:
+                    for bucket in self.buckets:
+                        bucket.take(now)
+                    return
+            time.sleep(wait)
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a URL was never recorded."""
+
+
+class ResponseCache:
+    """On-disk cache of JSON responses keyed by URL.
+
+    Responses for a season fetched after that season ended never expire.
+    Anything else (the current season, a season cached while it was still
+    running, the list of seasons) is considered fresh for `ttl` seconds and
+    is then revalidated with the stored ETag.
+    """
+
+    def __init__(self, cache_dir, ttl=6 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    def _path(self, url):
+        return self.cache_dir / f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+
+    def load(self, url):
+        path = self._path(url)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, url, data, etag=None):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = {'url': url, 'fetched_at': time.time(), 'etag': etag, 'data': data}
+        tmp_path = self._path(url).with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        tmp_path.replace(self._path(url))
+        return entry
+
+    def touch(self, entry):
+        """Mark an entry as fresh again after a 304 Not Modified."""
+        return self.save(entry['url'], entry['data'], entry['etag'])
+
+    def is_fresh(self, entry):
+        season = get_url_season(entry['url'])
+        # Fetched in a later year, the season was over and its data is final
+        if season is not None and datetime.fromtimestamp(entry['fetched_at']).year > season:
+            return True
+        return time.time() - entry['fetched_at'] < self.ttl
+
+
+def get_url_season(url):
+    """Season a URL refers to, or None for URLs that span seasons."""
+    match = re.search(r"/f1/(\d{4})(?:/|\.json)", url)
+    return int(match.group(1)) if match else None
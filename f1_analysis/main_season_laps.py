@@ -0,0 +1,123 @@
+# Set to True to answer from the local Ergast dump (f1_client/ergast_db.py) instead of the API
+USE_LOCAL_DB = False
+
+if USE_LOCAL_DB:
+    from f1_client.ergast_db import (
+        get_available_seasons,
+        get_season_races,
+        iter_race_laps,
+        get_race_pitstops
+    )
+else:
+    from f1_client.ergast_client import (
+        get_available_seasons,
+        get_season_races,
+        iter_race_laps,
+        get_race_pitstops
+    )
+from metrics.lap_metrics import compute_lap_metrics, compute_lap_season_metrics
+from store.laps_store import SeasonWriter, read_table, get_stored_years
+from manifest import load_manifest, save_manifest, is_season_over, get_pending_years
+import pandas as pd
+from pathlib import Path
+
+# Ergast has lap times from 1996 and pit stops from 2011
+LAPS_FIRST_YEAR = 1996
+PITSTOPS_FIRST_YEAR = 2011
+
+# Only fetch the seasons that were not final yet when last ingested (see manifest.py),
+# the metrics are recomputed from the whole store either way
+INCREMENTAL = False
+
+LAP_RACES_METRICS_FILE = Path('df_lap_races_metrics.csv')
+LAP_SEASON_METRICS_FILE = Path('df_lap_season_metrics.csv')
+GAP_EVOLUTION_FILE = Path('df_gap_evolution.csv')
+
+# "1:38.109", "58.109", "1:02:03.456": hours and minutes are optional
+LAP_TIME_PATTERN = r'^(?:(?:(?P<hours>\d+):)?(?P<minutes>\d+):)?(?P<seconds>\d+(?:\.\d+)?)$'
+
+
+def parse_lap_times(times):
+    """Milliseconds of Ergast lap and pit stop durations, NaN when missing or unreadable."""
+    parts = pd.Series(times, dtype=object).str.extract(LAP_TIME_PATTERN).astype(float)
+    seconds = parts['hours'].fillna(0) * 3600 + parts['minutes'].fillna(0) * 60 + parts['seconds']
+    return (seconds * 1000).round()
+
+
+def create_laps_df(year, round_number, laps):
+    """One row per driver and lap, from the 'Laps' of a race."""
+    df = pd.DataFrame([{
+        'driver_id': timing['driverId'],
+        'lap': int(lap['number']),
+        'position': int(timing['position']),
+        'time': timing.get('time')
+    } for lap in laps for timing in lap['Timings']])
+    df['milliseconds'] = parse_lap_times(df['time'])
+    return df.assign(year=year, round=int(round_number))
+
+
+def create_pitstops_df(year, round_number, pitstops):
+    df = pd.DataFrame([{
+        'driver_id': pitstop['driverId'],
+        'stop': int(pitstop['stop']),
+        'lap': int(pitstop['lap']),
+        'duration': pitstop.get('duration')
+    } for pitstop in pitstops])
+    if df.empty:
+        return df
+    df['milliseconds'] = parse_lap_times(df['duration'])
+    return df.assign(year=year, round=int(round_number))
+
+
+def ingest_season(year):
+    """Stream the laps and pit stops of every race of a season into the laps store, race by race."""
+    with SeasonWriter(year) as writer:
+        for race in get_season_races(year):
+            laps = list(iter_race_laps(year, race['round']))
+            if not laps:
+                # Not run yet
+                continue
+            writer.write_race('laps', create_laps_df(year, race['round'], laps))
+            if year >= PITSTOPS_FIRST_YEAR:
+                writer.write_race('pitstops', create_pitstops_df(year, race['round'], get_race_pitstops(year, race['round'])))
+
+
+def compute_store_metrics():
+    """Lap metrics of every stored season, one season in memory at a time."""
+    races_metrics, gap_evolutions = [], []
+    for year in get_stored_years('laps'):
+        df_laps = read_table('laps', years=[year])
+        df_pitstops = read_table('pitstops', ['year', 'round', 'driver_id', 'lap'], years=[year])
+        df_races_metrics, df_gap_evolution = compute_lap_metrics(df_laps, df_pitstops)
+        races_metrics.append(df_races_metrics)
+        gap_evolutions.append(df_gap_evolution)
+
+    df_races_metrics = pd.concat(races_metrics, ignore_index=True)
+    return df_races_metrics, compute_lap_season_metrics(df_races_metrics), pd.concat(gap_evolutions, ignore_index=True)
+
+
+def main(incremental=INCREMENTAL):
+    manifest = load_manifest()
+    if not incremental:
+        manifest['laps'] = {}
+
+    seasons = [year for year in get_available_seasons() if year >= LAPS_FIRST_YEAR]
+    for year in get_pending_years(manifest, 'laps', seasons):
+        print(year)
+        ingest_season(year)
+        manifest['laps'][year] = {'final': is_season_over(year)}
+        # Saved after every season, an interrupted INCREMENTAL ingest resumes where it stopped
+        save_manifest(manifest)
+
+    if not get_stored_years('laps'):
+        print("No laps stored")
+        return
+
+    df_races_metrics, df_seasons_metrics, df_gap_evolution = compute_store_metrics()
+    df_races_metrics.to_csv(LAP_RACES_METRICS_FILE)
+    df_seasons_metrics.to_csv(LAP_SEASON_METRICS_FILE)
+    df_gap_evolution.to_csv(GAP_EVOLUTION_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,173 @@
-from f1_client.ergast_client import (
-    get_available_seasons,
-    get_season_races,
-    get_race_results,
-    get_driver_standings,
-    get_constructor_standings
-)
-from metrics.race_metrics import (
-    get_position_changes,
-    get_position_interval,
-    convert_to_timedelta_column,
-    compute_gini_coefficient
+# Set to True to answer from the local Ergast dump (f1_client/ergast_db.py) instead of the API
+USE_LOCAL_DB = False
+
+if USE_LOCAL_DB:
+    from f1_client.ergast_db import (
+        get_available_seasons,
+        get_season_races,
+        get_race_results,
+        get_driver_standings,
+        get_constructor_standings,
+        iter_season_results
+    )
+else:
+    from f1_client.ergast_client import (
+        get_available_seasons,
+        get_season_races,
+        get_race_results,
+        get_driver_standings,
+        get_constructor_standings,
+        iter_season_results
+    )
+from metrics.history_metrics import (
+    RACE_METRICS_COLUMNS,
+    RESULTS_COLUMNS,
+    compute_races_metrics,
+    compute_season_metrics
 )
+from metrics.window_metrics import ROLLING_WINDOW, compute_rolling_metrics
+from store.results_store import write_results, read_results, get_stored_years
+from store.feature_store import update_features
+from manifest import load_manifest, save_manifest, is_season_over, get_pending_years
 import pandas as pd
-from collections import Counter
-
-
-def create_race_df(results):
-    df = pd.DataFrame([{
-        'position': r['position'],
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Fetch seasons and rounds from a thread pool instead of one after another.
+# Throughput is then bound by the client's rate limiter (see f1_client/ergast_client.py)
+CONCURRENT = False
+MAX_WORKERS = 8
+
+# Only fetch and compute the rounds that are not in the manifest yet (see manifest.py)
+# and upsert them into the existing csvs instead of rebuilding everything from 1950
+INCREMENTAL = False
+
+RACES_METRICS_FILE = Path('df_races_metrics.csv')
+SEASON_METRICS_FILE = Path('df_season_metrics.csv')
+# Metrics over the last ROLLING_WINDOW races
+ROLLING_METRICS_FILE = Path('df_rolling_metrics.csv')
+
+
+def create_results_df(races):
+    """One long-format table with the full classification of every race."""
+    return pd.DataFrame([{
+        'year': int(race['season']),
+        'round': int(race['round']),
+        'track_id': race['Circuit']['circuitId'],
+        'track_name': race['Circuit']['circuitName'],
+        'position': int(r['position']),
+        'position_text': r['positionText'],
+        'driver_id': r['Driver']['driverId'],
         'driver': f"{r['Driver']['givenName']} {r['Driver']['familyName']}",
+        'constructor_id': r['Constructor']['constructorId'],
         'constructor': r['Constructor']['name'],
-        'grid': r['grid'],
-        'time': r['Time']['time'] if 'Time' in r else None
-    } for r in results]).head()
-
-    df['grid'] = df['grid'].astype(int)
-    df['position'] = df['position'].astype(int)
-    df['time'] = convert_to_timedelta_column(df['time'])
-    df['position_change'] = get_position_changes(df['position'],df['grid'])
-    df['time_interval'] = get_position_interval(df['time'])
-    
-    return df
-
-
-def create_race_metrics_df(df_race, year, track_id, track_name):
-    average_gaps = df_race['time_interval'].iloc[1:].mean()
-    pos_changes = df_race['position_change'].abs().sum()
-    win_driver = df_race['driver'][0]
-    win_constructor = df_race['constructor'][0]
-    grid_position = df_race['grid'][0]
-
-    df_race_metrics = pd.DataFrame([{
-        'year': year,
-        'track_id': track_id,
-        'track_name': track_name,
-        'average_gap': average_gaps,
-        'position_change': pos_changes,
-        'winner': win_driver,
-        'constructor': win_constructor,
-        'grid': grid_position,
-    }])
+        'grid': int(r['grid']),
+        'laps': int(r['laps']),
+        'status': r['status'],
+        'points': float(r['points']),
+        'time': r['Time']['time'] if 'Time' in r else None,
+        'milliseconds': int(r['Time']['millis']) if 'Time' in r else None,
+        'fastest_lap': int(r['FastestLap']['lap']) if 'FastestLap' in r else None,
+        'fastest_lap_rank': int(r['FastestLap']['rank']) if 'rank' in r.get('FastestLap', {}) else None,
+        'fastest_lap_time': r['FastestLap']['Time']['time'] if 'FastestLap' in r else None
+    } for race in races for r in race['Results']])
 
-    return df_race_metrics
 
+def fetch_season_results(year):
+    """All races of a season with their 'Results', in 1 to 3 paginated requests."""
+    return list(iter_season_results(year))
 
-def create_season_metrics_df(year, df_races_metrics):
-    df_season = df_races_metrics.loc[df_races_metrics['year']==year]
-    average_gaps = sum(df_season['average_gap']) / len(df_season)
-    average_position_changes = sum(df_season['position_change']) / len(df_season)
-    winner_drivers_gini = compute_gini_coefficient(list(Counter(df_season['winner']).values()))
-    winner_constructors_gini = compute_gini_coefficient(list(Counter(df_season['constructor']).values()))    
 
-    df_season_metrics = pd.DataFrame([{
-        'year': year,
-        'average_gaps': average_gaps,
-        'average_position_change': average_position_changes,
-        'winner_drivers_gini': winner_drivers_gini,
-        'winner_constructors_gini': winner_constructors_gini
-    }])
-
-    return df_season_metrics
-
-
-def main():
-    
-    df_races_metrics = pd.DataFrame()
-    df_seasons_metrics = pd.DataFrame()
+def fetch_seasons_results(years):
+    """Yield (year, races) one season at a time."""
+    for year in years:
+        yield year, fetch_season_results(year)
 
-    years = get_available_seasons()
 
-    for year in years:
+def fetch_seasons_results_concurrently(years, max_workers=MAX_WORKERS):
+    """Same output as fetch_seasons_results, with the seasons spread over a thread pool.
 
-        races = get_season_races(year)
-        print(f"Found {len(races)} races in {year}")
+    executor.map keeps the submission order, so the results come back in
+    deterministic (year, round) order whatever order the requests complete in.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(zip(years, executor.map(fetch_season_results, years)))
 
-        race_gaps = []
-        position_changes = []
-        winner_drivers = []
-        winner_constructors = []
 
-        for race in races:
-            track_id = race['Circuit']['circuitId']
-            track_name = race['Circuit']['circuitName']
+def load_metrics(manifest):
+    """Existing outputs to upsert into, or empty frames when starting from scratch."""
+    if (manifest['races'] and RACES_METRICS_FILE.exists() and SEASON_METRICS_FILE.exists()
+            and set(manifest['races']) <= set(get_stored_years())):
+        return (
+            pd.read_csv(RACES_METRICS_FILE, index_col=0, float_precision='round_trip'),
+            pd.read_csv(SEASON_METRICS_FILE, index_col=0, float_precision='round_trip')
+        )
+    manifest['races'] = {}
+    return pd.DataFrame(), pd.DataFrame()
 
-            results = get_race_results(year, race['round'])
-            df_race = create_race_df(results)
-            df_race_metrics = create_race_metrics_df(df_race, year, track_id, track_name)
-            df_races_metrics = pd.concat([df_races_metrics, df_race_metrics], ignore_index=True)
-        
-        df_season_metrics = create_season_metrics_df(year, df_races_metrics)
-        df_seasons_metrics = pd.concat([df_seasons_metrics, df_season_metrics], ignore_index=True)
 
-    df_races_metrics.to_csv('df_races_metrics.csv')
-    df_seasons_metrics.to_csv('df_season_metrics.csv')
+def main(incremental=INCREMENTAL):
+    
+    manifest = load_manifest()
+    if not incremental:
+        manifest['races'] = {}
+    df_races_metrics, df_seasons_metrics = load_metrics(manifest)
+
+    years = get_pending_years(manifest, 'races', get_available_seasons())
+
+    # The SQLite backend answers instantly and its connection belongs to one thread
+    if CONCURRENT and not USE_LOCAL_DB:
+        seasons_results = fetch_seasons_results_concurrently(years)
+    else:
+        seasons_results = fetch_seasons_results(years)
+
+    new_rounds = []
+    updated_years = []
+    for year, races in seasons_results:
+
+        processed_rounds = set(manifest['races'].get(year, {}).get('rounds', []))
+        new_races = [race for race in races if int(race['round']) not in processed_rounds]
+
+        print(f"Found {len(races)} races in {year}, {len(new_races)} new")
+        if not new_races:
+            if races:
+                manifest['races'][year]['final'] = is_season_over(year)
+            continue
+
+        new_rounds.extend(new_races)
+        updated_years.append(year)
+
+        manifest['races'][year] = {
+            'rounds': sorted(processed_rounds | {int(race['round']) for race in new_races}),
+            'final': is_season_over(year)
+        }
+
+    if new_rounds:
+        write_results(create_results_df(new_rounds), replace_seasons=not incremental)
+
+        # Updated seasons are recomputed from the store, whatever order their rounds arrived in
+        df_new_races_metrics = compute_races_metrics(read_results(RESULTS_COLUMNS, updated_years))
+        if not df_races_metrics.empty:
+            df_races_metrics = df_races_metrics.loc[~df_races_metrics['year'].isin(updated_years)]
+        df_races_metrics = pd.concat([df_races_metrics, df_new_races_metrics[RACE_METRICS_COLUMNS]], ignore_index=True)
+        # Upserted seasons were appended at the end, put every row back in year order
+        df_races_metrics = df_races_metrics.sort_values('year', kind='stable').reset_index(drop=True)
+
+        df_updated_seasons = compute_season_metrics(df_races_metrics.loc[df_races_metrics['year'].isin(updated_years)])
+        if not df_seasons_metrics.empty:
+            df_seasons_metrics = df_seasons_metrics.loc[~df_seasons_metrics['year'].isin(updated_years)]
+        df_seasons_metrics = pd.concat([df_seasons_metrics, df_updated_seasons], ignore_index=True)
+        df_seasons_metrics = df_seasons_metrics.sort_values('year', kind='stable').reset_index(drop=True)
+
+    df_races_metrics.to_csv(RACES_METRICS_FILE)
+    df_seasons_metrics.to_csv(SEASON_METRICS_FILE)
+    save_manifest(manifest)
+
+    if new_rounds:
+        compute_rolling_metrics(read_results(RESULTS_COLUMNS), ROLLING_WINDOW).to_csv(ROLLING_METRICS_FILE)
+        # Only the races that are not in the feature store yet are computed and added, as a new version
+        update_features()
 
-    # TODO diversity of top 5
     # TODO create dashboard for season metrics:
     #      - (overall) plot bar of % winner and constructor
 
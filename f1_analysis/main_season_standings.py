@@ -1,83 +1,173 @@
-from f1_client.ergast_client import (
-    get_available_seasons,
-    get_season_races,
-    get_race_results,
-    get_driver_standings,
-    get_constructor_standings
-)
-
-import pandas as pd
-
-
-def create_driver_standings(year, standings):
-    df = pd.json_normalize(
-        standings,
-        sep='_',
-        record_prefix='',
-        meta=[
-            'position', 'points',
-            ['Driver', 'driverId'],
-            ['Driver', 'dateOfBirth'],
-            ['Driver', 'nationality']
-        ]
+# Set to True to answer from the local Ergast dump (f1_client/ergast_db.py) instead of the API
+USE_LOCAL_DB = False
+
+if USE_LOCAL_DB:
+    from f1_client.ergast_db import (
+        get_available_seasons,
+        get_season_races,
+        get_race_results,
+        get_driver_standings,
+        get_constructor_standings
     )
-
-    df = df.rename(columns={
-        'Driver_driverId': 'driver_id',
-        'Driver_dateOfBirth': 'dateOfBirth',
-        'Driver_nationality': 'nationality'
-    })
-
-    df = df[['position', 'points', 'driver_id', 'dateOfBirth', 'nationality']]
-    df['year']= year
-
-    return df
-
-
-def create_constructor_standings(year, standings):
-    df = pd.json_normalize(
-        standings,
-        sep='_',
-        record_prefix='',
-        meta=[
-            'position', 'points',
-            ['Constructor', 'constructorId'],
-            ['Constructor', 'nationality']
-        ]
+else:
+    from f1_client.ergast_client import (
+        get_available_seasons,
+        get_season_races,
+        get_race_results,
+        get_driver_standings,
+        get_constructor_standings
     )
+from manifest import load_manifest, save_manifest, is_season_over, get_pending_years
+from metrics.championship import PROGRESSION_COLUMNS, compute_drivers_progression, compute_constructors_progression
+from store.results_store import read_results
 
-    df = df.rename(columns={
-        'Constructor_constructorId': 'constructor_id',
-        'Constructor_nationality': 'nationality'
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Fetch seasons from a thread pool instead of one after another (the driver and
+# constructor standings of a season are always fetched at the same time).
+# Throughput is then bound by the client's rate limiter (see f1_client/ergast_client.py)
+CONCURRENT = False
+MAX_WORKERS = 8
+
+# Only refetch the seasons that were not final yet when last processed (see manifest.py)
+# and upsert them into the existing csvs
+INCREMENTAL = False
+
+DRIVERS_STANDINGS_FILE = Path('df_drivers_standings.csv')
+CONSTRUCTORS_STANDINGS_FILE = Path('df_constructors_standings.csv')
+
+# Standings after every round, rebuilt from the results store of main_season_races.py
+DRIVERS_PROGRESSION_FILE = Path('df_drivers_progression.csv')
+CONSTRUCTORS_PROGRESSION_FILE = Path('df_constructors_progression.csv')
+
+
+def create_drivers_standings(seasons_standings):
+    """One table for the driver standings of every (year, standings) pair, built column by column."""
+    records = [(year, standing) for year, standings in seasons_standings for standing in standings]
+    return pd.DataFrame({
+        'position': [standing.get('position') for _, standing in records],
+        'points': [standing['points'] for _, standing in records],
+        'driver_id': [standing['Driver']['driverId'] for _, standing in records],
+        'dateOfBirth': [standing['Driver'].get('dateOfBirth') for _, standing in records],
+        'nationality': [standing['Driver'].get('nationality') for _, standing in records],
+        'year': [year for year, _ in records],
     })
 
-    df = df[['position', 'points', 'constructor_id', 'nationality']]
-    df['year']= year
 
-    return df
+def create_constructors_standings(seasons_standings):
+    records = [(year, standing) for year, standings in seasons_standings for standing in standings]
+    return pd.DataFrame({
+        'position': [standing.get('position') for _, standing in records],
+        'points': [standing['points'] for _, standing in records],
+        'constructor_id': [standing['Constructor']['constructorId'] for _, standing in records],
+        'nationality': [standing['Constructor'].get('nationality') for _, standing in records],
+        'year': [year for year, _ in records],
+    })
 
 
-def main():
-    df_drivers_standings = pd.DataFrame()
-    df_constructors_standings = pd.DataFrame()
+def create_driver_standings(year, standings):
+    return create_drivers_standings([(year, standings)])
 
-    years = get_available_seasons()
 
-    for year in years:
+def create_constructor_standings(year, standings):
+    return create_constructors_standings([(year, standings)])
+
+
+def fetch_season_standings(year):
+    """(driver standings, constructor standings) of a season, both requests in flight at once.
+
+    The SQLite backend answers instantly and its connection belongs to one thread.
+    """
+    if USE_LOCAL_DB:
+        return get_driver_standings(year), get_constructor_standings(year)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        constructor_standings = executor.submit(get_constructor_standings, year)
+        return get_driver_standings(year), constructor_standings.result()
+
+
+def fetch_seasons_standings(years):
+    """(year, driver standings, constructor standings) of every season, in year order."""
+    if CONCURRENT and not USE_LOCAL_DB:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return [(year, *standings) for year, standings in zip(years, executor.map(fetch_season_standings, years))]
+    return [(year, *fetch_season_standings(year)) for year in years]
+
+
+def load_standings(manifest):
+    """Existing outputs to upsert into, or empty frames when starting from scratch.
+
+    Everything is read back as text so untouched rows are written out exactly as they were.
+    """
+    if manifest['standings'] and DRIVERS_STANDINGS_FILE.exists() and CONSTRUCTORS_STANDINGS_FILE.exists():
+        dfs = []
+        for path in (DRIVERS_STANDINGS_FILE, CONSTRUCTORS_STANDINGS_FILE):
+            df = pd.read_csv(path, index_col=0, dtype=str, keep_default_na=False)
+            df['year'] = df['year'].astype(int)
+            dfs.append(df)
+        return tuple(dfs)
+    manifest['standings'] = {}
+    return pd.DataFrame(), pd.DataFrame()
+
+
+def upsert_years(df, df_years, years):
+    """Replace the rows of `years` in df by df_years, every row in year order."""
+    if df_years.empty:
+        # Nothing fetched: concatenating the empty frame would turn the year column into floats
+        return df
+    if not df.empty:
+        df = df.loc[~df['year'].isin(years)]
+    # Upserted seasons are appended at the end, put every row back in year order
+    return pd.concat([df, df_years], ignore_index=True).sort_values('year', kind='stable').reset_index(drop=True)
+
+
+def save_progression():
+    """Standings after every round of every stored season, without any request."""
+    df_results = read_results(PROGRESSION_COLUMNS)
+    if df_results.empty:
+        print("No results stored yet, run main_season_races.py for the standings progression")
+        return
+    compute_drivers_progression(df_results).to_csv(DRIVERS_PROGRESSION_FILE)
+    compute_constructors_progression(df_results).to_csv(CONSTRUCTORS_PROGRESSION_FILE)
+
+
+def main(incremental=INCREMENTAL):
+    manifest = load_manifest()
+    if not incremental:
+        manifest['standings'] = {}
+    df_drivers_standings, df_constructors_standings = load_standings(manifest)
+
+    years = get_pending_years(manifest, 'standings', get_available_seasons())
+
+    drivers_seasons, constructors_seasons = [], []
+    for year, driver_standings, constructor_standings in fetch_seasons_standings(years):
         print(year)
-        driver_standings = get_driver_standings(year)
-        df_driver_standings = create_driver_standings(year, driver_standings)
-        df_drivers_standings = pd.concat([df_drivers_standings, df_driver_standings], ignore_index=True)
+        if not driver_standings:
+            print(f"Driver standings not available for {year}, skipping.")
+            continue
+        drivers_seasons.append((year, driver_standings))
 
-        constructor_standings = get_constructor_standings(year)      
         if constructor_standings:
-            df_constructor_standings = create_constructor_standings(year, constructor_standings)
-            df_constructors_standings = pd.concat([df_constructors_standings, df_constructor_standings], ignore_index=True)
+            constructors_seasons.append((year, constructor_standings))
         else:
             print(f"Constructor standings not available for {year}, skipping.")
 
-    df_drivers_standings.to_csv('df_drivers_standings.csv')
-    df_constructors_standings.to_csv('df_constructors_standings.csv')
+        manifest['standings'][year] = {'final': is_season_over(year)}
+
+    # Every fetched season is flattened in one pass and upserted at once
+    df_drivers_standings = upsert_years(
+        df_drivers_standings, create_drivers_standings(drivers_seasons), [year for year, _ in drivers_seasons]
+    )
+    df_constructors_standings = upsert_years(
+        df_constructors_standings, create_constructors_standings(constructors_seasons), [year for year, _ in constructors_seasons]
+    )
+
+    df_drivers_standings.to_csv(DRIVERS_STANDINGS_FILE)
+    df_constructors_standings.to_csv(CONSTRUCTORS_STANDINGS_FILE)
+    save_manifest(manifest)
+
+    save_progression()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,37 @@
+import json
+from datetime import date
+from pathlib import Path
+
+# Records what the incremental runs of main_season_races.py, main_season_standings.py
+# and main_season_laps.py have already processed:
+# {"races": {"2024": {"rounds": [1, 2, ...], "final": true}}, "standings": {"2024": {"final": true}},
+#  "laps": {"2024": {"final": true}}}
+MANIFEST_FILE = Path("processed_rounds.json")
+
+
+def load_manifest(path=MANIFEST_FILE):
+    path = Path(path)
+    if not path.exists():
+        return {'races': {}, 'standings': {}, 'laps': {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    return {section: {int(year): entry for year, entry in manifest.get(section, {}).items()}
+            for section in ('races', 'standings', 'laps')}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    tmp_path.replace(path)
+
+
+def is_season_over(year):
+    """A season can only change while it is the current one (or a future one)."""
+    return year < date.today().year
+
+
+def get_pending_years(manifest, section, years):
+    """Years of `section` that are not recorded as final yet."""
+    return [year for year in years if not manifest[section].get(year, {}).get('final', False)]
@@ -0,0 +1,224 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Standings after every round, rebuilt from the race results of the results store
+# (store/results_store.py) instead of one standings request per round.
+#
+# Race points come from the stored 'points' column, which already follows the
+# points system of its season and splits the points of shared drives between
+# the drivers. score_results recomputes them from the finishing positions with
+# POINTS_SYSTEMS, e.g. to compare eras. Sprint races are not part of the results.
+
+PointsSystem = namedtuple('PointsSystem', ['first_year', 'last_year', 'positions', 'fastest_lap', 'fastest_lap_max_position'])
+
+POINTS_SYSTEMS = [
+    PointsSystem(1950, 1959, [8, 6, 4, 3, 2], 1, None),
+    PointsSystem(1960, 1960, [8, 6, 4, 3, 2, 1], 0, None),
+    PointsSystem(1961, 1990, [9, 6, 4, 3, 2, 1], 0, None),
+    PointsSystem(1991, 2002, [10, 6, 4, 3, 2, 1], 0, None),
+    PointsSystem(2003, 2009, [10, 8, 6, 5, 4, 3, 2, 1], 0, None),
+    PointsSystem(2010, 2018, [25, 18, 15, 12, 10, 8, 6, 4, 2, 1], 0, None),
+    PointsSystem(2019, 2024, [25, 18, 15, 12, 10, 8, 6, 4, 2, 1], 1, 10),
+    PointsSystem(2025, 9999, [25, 18, 15, 12, 10, 8, 6, 4, 2, 1], 0, None),
+]
+
+# Only the best results counted: [(last round of the block, results counted)], the
+# last block (None) running to the end of the season. Unlisted seasons count everything.
+DROPPED_SCORES = {
+    **{year: [(None, 4)] for year in range(1950, 1954)},
+    **{year: [(None, 5)] for year in range(1954, 1958)},
+    1958: [(None, 6)],
+    1959: [(None, 5)],
+    1960: [(None, 6)],
+    1961: [(None, 5)],
+    1962: [(None, 5)],
+    **{year: [(None, 6)] for year in range(1963, 1966)},
+    1966: [(None, 5)],
+    1967: [(6, 5), (None, 4)],
+    1968: [(6, 5), (None, 5)],
+    1969: [(6, 5), (None, 4)],
+    1970: [(7, 6), (None, 5)],
+    1971: [(6, 5), (None, 4)],
+    1972: [(6, 5), (None, 5)],
+    1973: [(8, 7), (None, 6)],
+    1974: [(8, 7), (None, 6)],
+    1975: [(7, 6), (None, 6)],
+    1976: [(8, 7), (None, 7)],
+    1977: [(9, 8), (None, 7)],
+    1978: [(8, 7), (None, 7)],
+    1979: [(7, 4), (None, 4)],
+    1980: [(7, 5), (None, 5)],
+    **{year: [(None, 11)] for year in range(1981, 1991)},
+}
+
+CONSTRUCTORS_FIRST_YEAR = 1958
+# Until then only the best placed car of a constructor scored, and the
+# constructors' title dropped scores like the drivers' one
+CONSTRUCTORS_BEST_CAR_UNTIL = 1978
+# The Indianapolis 500 counted for the drivers' title only
+INDIANAPOLIS_TRACK_ID = 'indianapolis'
+INDIANAPOLIS_LAST_YEAR = 1960
+
+# Ties on points are broken on the number of wins, then of second places, ...
+COUNTBACK_POSITIONS = 10
+
+PROGRESSION_COLUMNS = ['year', 'round', 'track_id', 'driver_id', 'driver', 'constructor_id', 'constructor',
+                       'position', 'position_text', 'points', 'fastest_lap_rank']
+
+
+def get_points_system(year):
+    return next(system for system in POINTS_SYSTEMS if system.first_year <= year <= system.last_year)
+
+
+def score_results(df_results, year=None):
+    """Race points of every result under the points system of its season, or of `year`'s one.
+
+    Only classified finishers score, and the whole result gets the points even
+    for a shared drive.
+    """
+    years = df_results['year'] if year is None else pd.Series(year, index=df_results.index)
+    classified = df_results['position_text'].astype(str).str.isdigit()
+    fastest = df_results['fastest_lap_rank'] == 1
+
+    points = np.zeros(len(df_results))
+    for system in POINTS_SYSTEMS:
+        in_system = years.between(system.first_year, system.last_year).to_numpy()
+        if not in_system.any():
+            continue
+        table = np.zeros(df_results['position'].max() + 1)
+        table[1:len(system.positions) + 1] = system.positions
+        scored = in_system & classified.to_numpy()
+        points[scored] = table[df_results['position'].to_numpy()[scored]]
+
+        lap_point = in_system & fastest.fillna(False).to_numpy()
+        if system.fastest_lap_max_position is not None:
+            lap_point &= classified.to_numpy() & (df_results['position'].to_numpy() <= system.fastest_lap_max_position)
+        points[lap_point] += system.fastest_lap
+
+    return pd.Series(points, index=df_results.index, name='points')
+
+
+def get_counted_points(scores, blocks):
+    """Points counted after every round when only the best results of each block count.
+
+    scores has one row per driver (or constructor) and one column per round.
+    Every prefix of a block is sorted at once, so the whole season is a few
+    array operations.
+    """
+    counted = np.zeros_like(scores, dtype=float)
+    n_rounds = scores.shape[1]
+    start = 0
+    carried = np.zeros(len(scores))
+    for last_round, best in blocks:
+        end = n_rounds if last_round is None else min(last_round, n_rounds)
+        if end <= start:
+            continue
+        block = scores[:, start:end]
+        width = end - start
+        # prefixes[e, k, j]: score of round j if it is one of the first k + 1 rounds of the block
+        prefixes = np.where(np.tri(width, dtype=bool), block[:, None, :], 0)
+        best_scores = -np.sort(-prefixes, axis=2)[:, :, :best].sum(axis=2)
+        counted[:, start:end] = carried[:, None] + best_scores
+        carried = counted[:, end - 1]
+        start = end
+    counted[:, start:] = carried[:, None]
+    return counted
+
+
+def _rank_standings(points, finishes, entered):
+    """Championship positions after every round, ties broken by countback.
+
+    points and entered are (entities, rounds), finishes is the cumulative
+    number of 1st, 2nd, ... places (entities, rounds, COUNTBACK_POSITIONS).
+    """
+    positions = np.zeros(points.shape, dtype=int)
+    for r in range(points.shape[1]):
+        # np.lexsort sorts on the last key first
+        keys = tuple(-finishes[:, r, k] for k in reversed(range(finishes.shape[2]))) + (-points[:, r],)
+        order = [e for e in np.lexsort(keys) if entered[e, r]]
+        positions[order, r] = np.arange(1, len(order) + 1)
+    return positions
+
+
+def _season_progression(df_season, key, name, blocks):
+    rounds = np.sort(df_season['round'].unique())
+    entities = df_season.drop_duplicates(key)[[key, name]]
+    entity_index = pd.Index(entities[key])
+    rows = entity_index.get_indexer(df_season[key])
+    columns = np.searchsorted(rounds, df_season['round'].to_numpy())
+
+    race_points = np.zeros((len(entities), len(rounds)))
+    race_points[rows, columns] = df_season['points'].to_numpy()
+    entered = np.zeros(race_points.shape, dtype=bool)
+    entered[rows, columns] = True
+    entered = np.logical_or.accumulate(entered, axis=1)
+
+    finishes = np.zeros(race_points.shape + (COUNTBACK_POSITIONS,))
+    best_finish = df_season['best_finish'].to_numpy()
+    counted_finish = best_finish <= COUNTBACK_POSITIONS
+    finishes[rows[counted_finish], columns[counted_finish], best_finish[counted_finish] - 1] = 1
+    finishes = finishes.cumsum(axis=1)
+
+    gross_points = race_points.cumsum(axis=1)
+    points = get_counted_points(race_points, blocks) if blocks else gross_points
+    positions = _rank_standings(points, finishes, entered)
+
+    e, r = np.nonzero(entered)
+    return pd.DataFrame({
+        'year': df_season['year'].iloc[0],
+        'round': rounds[r],
+        key: entities[key].to_numpy()[e],
+        name: entities[name].to_numpy()[e],
+        'race_points': race_points[e, r],
+        'points': points[e, r],
+        'gross_points': gross_points[e, r],
+        'wins': finishes[e, r, 0].astype(int),
+        'position': positions[e, r],
+    })
+
+
+def _compute_progression(df_round_points, key, name, dropped_scores):
+    frames = [
+        _season_progression(df_season, key, name, dropped_scores.get(year))
+        for year, df_season in df_round_points.groupby('year', sort=True)
+    ]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values(['year', 'round', 'position'], kind='stable').reset_index(drop=True)
+
+
+def _get_round_points(df, key, name, best_car_only=None):
+    """Points and best finish of every driver (constructor) in every round."""
+    df = df.assign(
+        best_finish=df['position'].where(df['position_text'].astype(str).str.isdigit(), COUNTBACK_POSITIONS + 1),
+        **{key: df[key].astype(object), name: df[name].astype(object)}
+    )
+    by_round = df.groupby(['year', 'round', key], sort=False)
+    df_round = by_round.agg(**{name: (name, 'first'), 'best_finish': ('best_finish', 'min')}).reset_index()
+    summed, best = by_round['points'].sum().to_numpy(), by_round['points'].max().to_numpy()
+    df_round['points'] = summed if best_car_only is None else np.where(best_car_only(df_round['year']), best, summed)
+    return df_round
+
+
+def compute_drivers_progression(df_results):
+    """Drivers' standings after every round of every season in df_results.
+
+    df_results needs the PROGRESSION_COLUMNS of the results store. Drivers
+    appear from their first race on; 'points' are the points counted for
+    the title, 'gross_points' every point scored.
+    """
+    df_round_points = _get_round_points(df_results, 'driver_id', 'driver')
+    return _compute_progression(df_round_points, 'driver_id', 'driver', DROPPED_SCORES)
+
+
+def compute_constructors_progression(df_results):
+    """Constructors' standings after every round, from 1958 when the title started."""
+    df = df_results.loc[df_results['year'] >= CONSTRUCTORS_FIRST_YEAR]
+    df = df.loc[~((df['track_id'] == INDIANAPOLIS_TRACK_ID) & (df['year'] <= INDIANAPOLIS_LAST_YEAR))]
+    df_round_points = _get_round_points(
+        df, 'constructor_id', 'constructor', best_car_only=lambda years: years <= CONSTRUCTORS_BEST_CAR_UNTIL
+    )
+    dropped_scores = {year: blocks for year, blocks in DROPPED_SCORES.items() if year <= CONSTRUCTORS_BEST_CAR_UNTIL}
+    return _compute_progression(df_round_points, 'constructor_id', 'constructor', dropped_scores)
@@ -0,0 +1,243 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics.championship import (
+    CONSTRUCTORS_BEST_CAR_UNTIL,
+    CONSTRUCTORS_FIRST_YEAR,
+    COUNTBACK_POSITIONS,
+    INDIANAPOLIS_LAST_YEAR,
+    INDIANAPOLIS_TRACK_ID,
+    get_points_system
+)
+
+# Monte Carlo simulation of the end of a season: in every remaining race, each driver's
+# finishing position is drawn from the positions they finished in recently and the
+# draws are turned into a finishing order. A chunk of simulated seasons is a handful
+# of array operations over (simulations, races, drivers), no loop over seasons or races.
+
+N_SIMULATIONS = 200_000
+CHUNK_SIZE = 20_000
+# Results of each driver the position distributions are built from
+HISTORY_RACES = 20
+# Pseudo races of the whole field's distribution mixed into each driver's one,
+# so that a driver with a handful of results is not stuck to them
+PRIOR_WEIGHT = 2
+
+SIMULATION_COLUMNS = ['year', 'round', 'track_id', 'driver_id', 'driver', 'constructor_id', 'constructor',
+                      'position', 'position_text']
+
+# Points totals closer than this are a tie (shared drives score fractions of points)
+POINTS_TOLERANCE = 1e-9
+
+
+def get_position_distributions(df_results, drivers, history_races=HISTORY_RACES, prior_weight=PRIOR_WEIGHT):
+    """Probability of every finishing position 1..len(drivers) for each driver, one row per driver.
+
+    Built from the last `history_races` results of each driver in df_results,
+    positions beyond the simulated field counting as last place.
+    """
+    n_drivers = len(drivers)
+    df = df_results.loc[df_results['driver_id'].isin(drivers)].sort_values(['year', 'round'], kind='stable')
+    df = df.groupby('driver_id', observed=True).tail(history_races)
+
+    counts = np.zeros((n_drivers, n_drivers))
+    rows = pd.Index(drivers).get_indexer(df['driver_id'])
+    np.add.at(counts, (rows, np.clip(df['position'].to_numpy(), 1, n_drivers) - 1), 1)
+
+    field = counts.sum(axis=0)
+    field = field / field.sum() if field.any() else np.full(n_drivers, 1 / n_drivers)
+    smoothed = counts + prior_weight * field
+    return smoothed / smoothed.sum(axis=1, keepdims=True)
+
+
+def _count_finishes(df_results, key, ids):
+    """Number of 1st, 2nd, ... places (up to COUNTBACK_POSITIONS) of every id, counting its best result of each round."""
+    classified = df_results['position_text'].astype(str).str.isdigit() & (df_results['position'] <= COUNTBACK_POSITIONS)
+    df = df_results.loc[classified, ['round', key, 'position']].astype({key: object})
+    best = df.groupby(['round', key])['position'].min().reset_index()
+
+    counts = np.zeros((len(ids), COUNTBACK_POSITIONS))
+    rows = pd.Index(ids).get_indexer(best[key])
+    found = rows >= 0
+    np.add.at(counts, (rows[found], best['position'].to_numpy()[found] - 1), 1)
+    return counts
+
+
+def _get_champions(totals, finishes, simulated_ranks, columns, rng):
+    """Index of the champion of every simulated season, as in metrics/championship.py.
+
+    The most points win, ties are broken by countback: current finishes plus
+    the simulated ranks (0 for a win) of `columns`, then at random.
+    """
+    leaders = totals >= totals.max(axis=1, keepdims=True) - POINTS_TOLERANCE
+    # Only the seasons still tied go through the next countback place
+    tied = np.flatnonzero(leaders.sum(axis=1) > 1)
+    for k in range(COUNTBACK_POSITIONS):
+        if not len(tied):
+            break
+        counts = np.repeat(finishes[None, :, k], len(tied), axis=0)
+        counts[:, columns] += (simulated_ranks[tied] == k).sum(axis=1)
+        counts = np.where(leaders[tied], counts, -1)
+        leaders[tied] &= counts == counts.max(axis=1, keepdims=True)
+        tied = tied[leaders[tied].sum(axis=1) > 1]
+    return np.argmax(leaders * rng.random(leaders.shape), axis=1)
+
+
+def _simulate_chunk(args):
+    """Number of titles of every driver and constructor over one chunk of simulated seasons."""
+    (distributions, racing, driver_points, driver_finishes, constructor_index, constructor_points,
+     constructor_finishes, race_points, best_car_only, n_races, n_simulations, seed) = args
+    rng = np.random.default_rng(seed)
+    n_racing = len(racing)
+    n_constructors = len(constructor_points)
+
+    # Inverse CDF sampling for every driver at once: driver d's cdf is shifted by d
+    # so that all of them fit in one sorted array for searchsorted
+    cdf = np.cumsum(distributions, axis=1)
+    cdf[:, -1] = 1
+    offsets = np.arange(n_racing)
+    u = rng.random((n_simulations, n_races, n_racing))
+    positions = np.searchsorted((cdf + offsets[:, None]).ravel(), u + offsets, side='right') - offsets * n_racing
+
+    # Drawn positions collide, a random tie break turns them into a finishing order
+    order = np.argsort(positions + rng.random(positions.shape), axis=2)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n_racing), axis=2)
+
+    gained = np.zeros((n_simulations, len(driver_points)))
+    gained[:, racing] = race_points[ranks].sum(axis=1)
+
+    # Best placed car of every constructor in every race, no_car (no points, no countback
+    # place) when none of its cars races
+    no_car = max(n_racing, COUNTBACK_POSITIONS)
+    constructor_ranks = np.full((n_simulations, n_races, n_constructors), no_car)
+    racing_constructors = constructor_index[racing]
+    for constructor in np.unique(racing_constructors):
+        constructor_ranks[:, :, constructor] = ranks[:, :, racing_constructors == constructor].min(axis=2)
+    if best_car_only:
+        best_car_points = np.zeros(no_car + 1)
+        best_car_points[:n_racing] = race_points
+        constructor_gained = best_car_points[constructor_ranks].sum(axis=1)
+    else:
+        constructor_gained = gained @ np.eye(n_constructors)[constructor_index]
+
+    champions = _get_champions(driver_points + gained, driver_finishes, ranks, racing, rng)
+    constructor_champions = _get_champions(
+        constructor_points + constructor_gained, constructor_finishes, constructor_ranks, np.arange(n_constructors), rng
+    )
+    return (
+        np.bincount(champions, minlength=len(driver_points)),
+        np.bincount(constructor_champions, minlength=n_constructors)
+    )
+
+
+def simulate_championship(distributions, racing, driver_points, constructor_index, constructor_points, race_points,
+                          n_races, driver_finishes=None, constructor_finishes=None, best_car_only=False,
+                          n_simulations=N_SIMULATIONS, chunk_size=CHUNK_SIZE, processes=None, seed=0):
+    """Title probabilities of every driver and constructor after `n_races` more races.
+
+    distributions: position probabilities of the drivers still racing (get_position_distributions)
+    racing: index of those drivers in driver_points
+    driver_points, constructor_points: current points
+    constructor_index: index in constructor_points of each driver's constructor
+    race_points: points of positions 1, 2, ... of a race
+    driver_finishes, constructor_finishes: current number of 1st, 2nd, ... places
+    (COUNTBACK_POSITIONS columns) for the countback of tied seasons, none by default
+    best_car_only: only the best placed car of a constructor scores, as until CONSTRUCTORS_BEST_CAR_UNTIL
+
+    Dropped scores are not simulated. Chunks get their own seeds from one
+    SeedSequence, so the result only depends on `seed`, whether the chunks
+    run here or in a pool of `processes` processes.
+    """
+    n_racing = len(racing)
+    table = np.zeros(n_racing)
+    table[:min(n_racing, len(race_points))] = race_points[:n_racing]
+
+    sizes = [min(chunk_size, n_simulations - start) for start in range(0, n_simulations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if driver_finishes is None:
+        driver_finishes = np.zeros((len(driver_points), COUNTBACK_POSITIONS))
+    if constructor_finishes is None:
+        constructor_finishes = np.zeros((len(constructor_points), COUNTBACK_POSITIONS))
+    args = [
+        (distributions, np.asarray(racing), np.asarray(driver_points, dtype=float), np.asarray(driver_finishes),
+         np.asarray(constructor_index), np.asarray(constructor_points, dtype=float), np.asarray(constructor_finishes),
+         table, best_car_only, n_races, size, chunk_seed)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+
+    if processes:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_simulate_chunk, args))
+    else:
+        results = [_simulate_chunk(chunk_args) for chunk_args in args]
+
+    driver_titles = sum(titles for titles, _ in results)
+    constructor_titles = sum(titles for _, titles in results)
+    return driver_titles / n_simulations, constructor_titles / n_simulations
+
+
+def compute_title_probabilities(df_results, df_drivers_progression, df_constructors_progression, year, after_round,
+                                n_races, **simulation_kwargs):
+    """Title probabilities of the drivers and constructors of `year` after round `after_round`.
+
+    df_results needs the SIMULATION_COLUMNS of the results store, the
+    progressions come from metrics/championship.py. Only the drivers of the
+    last round race in the simulation, from the distribution of their last
+    HISTORY_RACES results up to that round. n_races is the number of races
+    left in the season calendar, len(get_season_races(year)) - after_round:
+    the results store only holds the rounds already run. The constructors
+    frame is empty before CONSTRUCTORS_FIRST_YEAR.
+    """
+    history = df_results.loc[(df_results['year'] < year) | ((df_results['year'] == year) & (df_results['round'] <= after_round))]
+    season = df_results.loc[df_results['year'] == year]
+
+    df_drivers = df_drivers_progression.loc[
+        (df_drivers_progression['year'] == year) & (df_drivers_progression['round'] == after_round),
+        ['driver_id', 'driver', 'points']
+    ].astype({'driver_id': object, 'driver': object}).reset_index(drop=True)
+    df_constructors = df_constructors_progression.loc[
+        (df_constructors_progression['year'] == year) & (df_constructors_progression['round'] == after_round),
+        ['constructor_id', 'constructor', 'points']
+    ].astype({'constructor_id': object, 'constructor': object}).reset_index(drop=True)
+
+    last_round = season.loc[season['round'] == after_round]
+    racing = np.flatnonzero(df_drivers['driver_id'].isin(last_round['driver_id']))
+
+    # Each driver scores for the last constructor they drove for, constructors
+    # without points yet join the standings with 0
+    df_last = (history.loc[history['year'] == year, ['driver_id', 'constructor_id', 'constructor']]
+               .astype(object).drop_duplicates('driver_id', keep='last'))
+    constructor_ids = df_drivers['driver_id'].map(df_last.set_index('driver_id')['constructor_id'])
+    df_missing = (df_last.loc[df_last['constructor_id'].isin(constructor_ids)
+                              & ~df_last['constructor_id'].isin(df_constructors['constructor_id'])]
+                  .drop_duplicates('constructor_id')[['constructor_id', 'constructor']].assign(points=0.0))
+    df_constructors = pd.concat([df_constructors, df_missing], ignore_index=True)
+    constructor_index = pd.Index(df_constructors['constructor_id']).get_indexer(constructor_ids)
+
+    # Finishes so far for the countback, the Indianapolis 500 only counting for the drivers
+    season_so_far = history.loc[history['year'] == year]
+    constructors_season = season_so_far.loc[
+        ~((season_so_far['track_id'] == INDIANAPOLIS_TRACK_ID) & (year <= INDIANAPOLIS_LAST_YEAR))
+    ]
+    driver_finishes = _count_finishes(season_so_far, 'driver_id', df_drivers['driver_id'])
+    constructor_finishes = _count_finishes(constructors_season, 'constructor_id', df_constructors['constructor_id'])
+
+    distributions = get_position_distributions(history, df_drivers['driver_id'].to_numpy()[racing])
+    driver_titles, constructor_titles = simulate_championship(
+        distributions, racing, df_drivers['points'], constructor_index, df_constructors['points'],
+        np.array(get_points_system(year).positions, dtype=float), n_races,
+        driver_finishes=driver_finishes, constructor_finishes=constructor_finishes,
+        best_car_only=year <= CONSTRUCTORS_BEST_CAR_UNTIL, **simulation_kwargs
+    )
+
+    df_drivers['title_probability'] = driver_titles
+    df_constructors['title_probability'] = constructor_titles
+    if year < CONSTRUCTORS_FIRST_YEAR:
+        df_constructors = df_constructors.iloc[:0]
+    return (
+        df_drivers.sort_values('title_probability', ascending=False, kind='stable').reset_index(drop=True),
+        df_constructors.sort_values('title_probability', ascending=False, kind='stable').reset_index(drop=True)
+    )
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from metrics.race_metrics import (
+    get_position_changes,
+    parse_race_times,
+    compute_grouped_count_gini
+)
+
+RACE_KEYS = ['year', 'round']
+TOP_N = 5
+
+# Columns of the results store (store/results_store.py) the metrics need
+RESULTS_COLUMNS = ['year', 'round', 'track_id', 'track_name', 'position', 'driver', 'constructor', 'grid', 'time']
+
+RACE_METRICS_COLUMNS = [
+    'year', 'track_id', 'track_name', 'average_gap', 'position_change', 'winner', 'constructor', 'grid'
+]
+
+
+def get_top_finishers(df_results, top_n=TOP_N):
+    """First `top_n` classified drivers of every race, in finishing order."""
+    df = df_results.sort_values(RACE_KEYS + ['position'], kind='stable')
+    return df.loc[df.groupby(RACE_KEYS, sort=False).cumcount() < top_n].reset_index(drop=True)
+
+
+def get_average_gaps(df_top, top_n=TOP_N):
+    """Mean of the intervals behind the leader of every race, skipping missing ones.
+
+    The intervals are laid out as one row per race so that the sum is the same
+    numpy reduction as Series.mean() over a single race.
+    """
+    rank = df_top.groupby(RACE_KEYS, sort=False).cumcount().to_numpy()
+    race = df_top.groupby(RACE_KEYS, sort=False).ngroup().to_numpy()
+    intervals = np.zeros((race.max() + 1, top_n - 1))
+    counts = np.zeros(race.max() + 1)
+
+    valid = (rank > 0) & df_top['time_interval'].notna().to_numpy()
+    intervals[race[valid], rank[valid] - 1] = df_top['time_interval'].to_numpy()[valid]
+    np.add.at(counts, race[valid], 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, intervals.sum(axis=1) / counts, np.nan)
+
+
+def compute_races_metrics(df_results, top_n=TOP_N):
+    """Race metrics for every race of a long-format results table in one pass.
+
+    df_results has one row per driver and race with the columns year, round,
+    track_id, track_name, position, driver, constructor, grid and time (the raw
+    Ergast time string). Output rows are in (year, round) order.
+    """
+    df = get_top_finishers(df_results, top_n)
+    race_keys = [df[key] for key in RACE_KEYS]
+
+    df['time'] = parse_race_times(df['time'], race_ids=df.groupby(race_keys, sort=False).ngroup())
+    df['position_change'] = get_position_changes(df['position'], df['grid'])
+    df['time_interval'] = df['time'].groupby(race_keys, sort=False).diff().dt.total_seconds()
+
+    df_races = df.drop_duplicates(RACE_KEYS).reset_index(drop=True)
+    df_races = df_races[RACE_KEYS + ['track_id', 'track_name', 'driver', 'constructor', 'grid']]
+    df_races = df_races.rename(columns={'driver': 'winner'})
+    df_races['average_gap'] = get_average_gaps(df, top_n)
+    df_races['position_change'] = df['position_change'].abs().groupby(race_keys, sort=False).sum().to_numpy()
+
+    return df_races[RACE_KEYS + RACE_METRICS_COLUMNS[1:]]
+
+
+def compute_season_metrics(df_races_metrics):
+    by_year = df_races_metrics.groupby('year')
+
+    df_seasons = pd.DataFrame({
+        # Plain sum so that a season with a missing gap stays NaN, as before
+        'average_gaps': by_year['average_gap'].agg(lambda s: sum(s) / len(s)),
+        'average_position_change': by_year['position_change'].sum() / by_year.size(),
+        'winner_drivers_gini': compute_grouped_count_gini(df_races_metrics, 'year', 'winner'),
+        'winner_constructors_gini': compute_grouped_count_gini(df_races_metrics, 'year', 'constructor'),
+    })
+
+    return df_seasons.reset_index()
+
+
+def compute_history_metrics(df_results, top_n=TOP_N):
+    """Race table and season table for a whole results history."""
+    df_races_metrics = compute_races_metrics(df_results, top_n)
+    df_seasons_metrics = compute_season_metrics(df_races_metrics)
+    return df_races_metrics, df_seasons_metrics
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from metrics.history_metrics import RACE_KEYS, TOP_N
+
+# Metrics of the lap-by-lap store (store/laps_store.py). A batch of races is laid
+# out as (race, lap, driver) arrays and every metric is a reduction over them,
+# so the whole history can be computed one season at a time in a few MB.
+
+# Laps on which a stop moves a driver through the order: the lap they come in
+# on and the out lap after it. Position changes on those laps are not overtakes.
+PIT_LAPS = 2
+# A stop's position change compares the lap before it with PIT_CYCLE_LAPS laps
+# after it, once the cars around have made their own stops
+PIT_CYCLE_LAPS = 3
+
+LAP_RACE_METRICS_COLUMNS = [
+    'year', 'round', 'laps', 'lead_changes', 'leaders', 'overtakes',
+    'pit_stops', 'pit_position_changes', 'average_pit_position_loss', 'average_gap_to_leader'
+]
+GAP_EVOLUTION_COLUMNS = ['year', 'round', 'lap', 'leader', 'second_gap', 'average_gap_to_leader']
+
+
+def _to_arrays(df_laps, df_pitstops):
+    """(race, lap, driver) arrays of positions, lap times and pit laps; lap 0 is the start."""
+    races = df_laps.groupby(RACE_KEYS, sort=True).ngroup().to_numpy()
+    df_races = df_laps[RACE_KEYS].drop_duplicates().sort_values(RACE_KEYS).reset_index(drop=True)
+    drivers, driver_ids = pd.factorize(df_laps['driver_id'].astype(object))
+    laps = df_laps['lap'].to_numpy(dtype=int)
+    shape = (len(df_races), laps.max() + 1, len(driver_ids))
+
+    positions = np.full(shape, np.nan)
+    positions[races, laps, drivers] = df_laps['position'].to_numpy(dtype=float)
+    lap_times = np.full(shape, np.nan)
+    lap_times[:, 0] = 0
+    lap_times[races, laps, drivers] = df_laps['milliseconds'].to_numpy(dtype=float)
+
+    # Stops of drivers without laps (or beyond the last lap) cannot be placed
+    stop_races = pd.MultiIndex.from_frame(df_races).get_indexer(pd.MultiIndex.from_frame(df_pitstops[RACE_KEYS]))
+    stop_drivers = pd.Index(driver_ids).get_indexer(df_pitstops['driver_id'].astype(object))
+    stop_laps = df_pitstops['lap'].to_numpy(dtype=int)
+    placed = (stop_races >= 0) & (stop_drivers >= 0) & (stop_laps < shape[1])
+    stops = stop_races[placed], stop_laps[placed], stop_drivers[placed]
+
+    pitting = np.zeros((shape[0], shape[1] + PIT_LAPS, shape[2]), dtype=bool)
+    for offset in range(PIT_LAPS):
+        pitting[stops[0], stops[1] + offset, stops[2]] = True
+
+    return df_races, np.asarray(driver_ids), positions, lap_times, pitting[:, :shape[1]], stops
+
+
+def _sum_mean(values, valid, axis):
+    """Mean of `values` where `valid` along axis, NaN where nothing is valid."""
+    counts = valid.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, values, 0).sum(axis=axis) / np.where(counts > 0, counts, np.nan)
+
+
+def compute_lap_metrics(df_laps, df_pitstops, top_n=TOP_N):
+    """Race metrics and gap-to-leader evolution of every race of df_laps.
+
+    df_laps and df_pitstops are tables of the laps store. Returns one row per
+    race (LAP_RACE_METRICS_COLUMNS) and one row per lap (GAP_EVOLUTION_COLUMNS):
+      - lead_changes: laps led by another driver than the lap before, leaders: drivers who led a lap
+      - overtakes: pairs of drivers swapping places from one lap to the next, neither of them
+        on a pit lap (NaN for the races without pit stop data)
+      - pit_position_changes: sum of the positions gained or lost over the pit cycle of every
+        stop, average_pit_position_loss: their mean (positive when positions are lost)
+      - second_gap / average_gap_to_leader: seconds behind the leader at the end of each lap of
+        P2 / of P2 to P`top_n`, averaged over the laps for the race
+    """
+    df_races, driver_ids, positions, lap_times, pitting, stops = _to_arrays(df_laps, df_pitstops)
+    n_races, n_laps = positions.shape[:2]
+
+    # --- Lead changes ---
+    leading = positions == 1
+    has_leader = leading.any(axis=2)
+    leader = leading.argmax(axis=2)
+    lead_changes = (has_leader[:, 1:] & has_leader[:, :-1] & (leader[:, 1:] != leader[:, :-1])).sum(axis=1)
+
+    # --- Overtakes ---
+    # From lap 2 on, the first lap is the start
+    before, after = positions[:, 1:-1], positions[:, 2:]
+    clean = ~np.isnan(before) & ~np.isnan(after) & ~pitting[:, 2:]
+    passes = (
+        (before[..., :, None] > before[..., None, :]) & (after[..., :, None] < after[..., None, :])
+        & clean[..., :, None] & clean[..., None, :]
+    )
+    overtakes = np.where(pitting.any(axis=(1, 2)), passes.sum(axis=(1, 2, 3)), np.nan)
+
+    # --- Pit cycle ---
+    stop_races, stop_laps, stop_drivers = stops
+    position_before = positions[stop_races, stop_laps - 1, stop_drivers]
+    position_after = positions[stop_races, np.minimum(stop_laps + PIT_CYCLE_LAPS, n_laps - 1), stop_drivers]
+    loss = position_after - position_before
+    counted = ~np.isnan(loss)
+    pit_stops = np.bincount(stop_races, minlength=n_races)
+    pit_changes = np.bincount(stop_races[counted], weights=np.abs(loss[counted]), minlength=n_races)
+    pit_counts = np.bincount(stop_races[counted], minlength=n_races)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_loss = np.bincount(stop_races[counted], weights=loss[counted], minlength=n_races) / pit_counts
+
+    # --- Gap to leader ---
+    elapsed = np.cumsum(lap_times, axis=1)
+    leader_elapsed = np.where(has_leader, np.take_along_axis(elapsed, leader[..., None], axis=2)[..., 0], np.nan)
+    gaps = (elapsed - leader_elapsed[..., None]) / 1000
+    timed = ~np.isnan(gaps)
+    second_gap = _sum_mean(gaps, timed & (positions == 2), axis=2)
+    average_gap = _sum_mean(gaps, timed & (positions >= 2) & (positions <= top_n), axis=2)
+
+    df_race_metrics = df_races.assign(
+        laps=np.where(has_leader, np.arange(n_laps), 0).max(axis=1),
+        lead_changes=lead_changes,
+        leaders=leading.any(axis=1).sum(axis=1),
+        overtakes=overtakes,
+        pit_stops=pit_stops,
+        pit_position_changes=np.where(pit_stops > 0, pit_changes, np.nan),
+        average_pit_position_loss=average_loss,
+        average_gap_to_leader=_sum_mean(average_gap, ~np.isnan(average_gap), axis=1),
+    )
+
+    race_index, lap_index = np.nonzero(has_leader)
+    df_gap_evolution = pd.DataFrame({
+        'year': df_races['year'].to_numpy()[race_index],
+        'round': df_races['round'].to_numpy()[race_index],
+        'lap': lap_index,
+        'leader': driver_ids[leader[race_index, lap_index]],
+        'second_gap': second_gap[race_index, lap_index],
+        'average_gap_to_leader': average_gap[race_index, lap_index],
+    })
+
+    return df_race_metrics[LAP_RACE_METRICS_COLUMNS], df_gap_evolution[GAP_EVOLUTION_COLUMNS]
+
+
+def compute_lap_season_metrics(df_lap_race_metrics):
+    """Per season averages of the race metrics of compute_lap_metrics."""
+    by_year = df_lap_race_metrics.groupby('year')
+    df_seasons = pd.DataFrame({
+        'races': by_year.size(),
+        'average_lead_changes': by_year['lead_changes'].mean(),
+        'average_overtakes': by_year['overtakes'].mean(),
+        'average_pit_position_changes': by_year['pit_position_changes'].mean(),
+        'average_gap_to_leader': by_year['average_gap_to_leader'].mean(),
+    })
+    return df_seasons.reset_index()
@@ -0,0 +1,153 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from metrics.history_metrics import RACE_KEYS
+
+# Pre-race features of every (year, round, driver) of the results store, for race
+# outcome models. Every feature of a race is computed from earlier races only: the
+# groups are shifted by one race before any window, so the row of a race never
+# sees its own result (or a later one). grid is the race's own starting grid,
+# known before the start.
+#
+# The earlier races only matter through a FeatureState (the last results of every
+# driver and constructor, the totals of every driver at every track), so new races,
+# or the entrants of the next one, are computed from it without the whole history.
+
+FORM_RACES = 5
+GRID_RACES = 10
+CONSTRUCTOR_RACES = 5
+
+# Columns of the results store the features need
+FEATURES_RESULTS_COLUMNS = [
+    'year', 'round', 'track_id', 'driver_id', 'constructor_id', 'position', 'position_text', 'grid', 'points'
+]
+
+FEATURE_KEYS = RACE_KEYS + ['driver_id']
+FEATURE_COLUMNS = FEATURE_KEYS + [
+    'track_id', 'constructor_id', 'grid',
+    # Rolling form of the driver over their last FORM_RACES races
+    'form_races', 'form_position', 'form_points', 'form_finish_rate',
+    # Grid versus finish over their last GRID_RACES races
+    'form_grid', 'form_positions_gained',
+    # Constructor over its last CONSTRUCTOR_RACES races: mean position of its cars, points per race
+    'constructor_position', 'constructor_points',
+    # Driver's previous races at the track
+    'track_starts', 'track_position', 'track_wins',
+]
+
+# Results of a driver the windows reach back to
+DRIVER_STATE_RACES = max(FORM_RACES, GRID_RACES)
+
+# drivers: last DRIVER_STATE_RACES results of every driver, constructors: last
+# CONSTRUCTOR_RACES races of every constructor (mean position of its cars, points),
+# tracks: starts, sum of positions and wins of every driver at every track
+FeatureState = namedtuple('FeatureState', ['drivers', 'constructors', 'tracks'])
+
+
+def _rolling_before(values, groups, window):
+    """Mean of the previous `window` values of every row's group, NaN values skipped."""
+    previous = values.groupby(groups, observed=True).shift()
+    return previous.groupby(groups, observed=True).rolling(window, min_periods=1).mean().droplevel(0).sort_index()
+
+
+def _expanding_before(values, groups):
+    """Sum and count of the previous values of every row's group."""
+    # The unknown outcome of an upcoming race adds nothing
+    values = values.fillna(0)
+    by_group = values.groupby(groups, observed=True)
+    return by_group.cumsum() - values, by_group.cumcount()
+
+
+def _get_driver_results(df_results):
+    """FEATURES_RESULTS_COLUMNS in race order, columns missing from df_results left empty.
+
+    A driver sharing cars in a race only keeps their best result.
+    """
+    return (df_results.reindex(columns=FEATURES_RESULTS_COLUMNS).sort_values(RACE_KEYS + ['position'], kind='stable')
+            .drop_duplicates(FEATURE_KEYS).reset_index(drop=True))
+
+
+def _get_constructor_races(df):
+    """Mean position of the cars and points of every constructor in every race."""
+    return (df.assign(position=df['position'].astype(float))
+            .groupby(RACE_KEYS + ['constructor_id'], observed=True, sort=False)
+            .agg(position=('position', 'mean'), points=('points', 'sum')).reset_index())
+
+
+def get_feature_state(df_results):
+    """FeatureState after the races of df_results (FEATURES_RESULTS_COLUMNS)."""
+    df = _get_driver_results(df_results)
+    df_constructors = _get_constructor_races(df)
+    position = df['position'].astype(float)
+    df_tracks = (df.assign(position=position, wins=(position == 1).astype(int))
+                 .groupby(['driver_id', 'track_id'], observed=True, sort=False)
+                 .agg(starts=('position', 'size'), positions=('position', 'sum'), wins=('wins', 'sum')).reset_index())
+    return FeatureState(
+        drivers=df.groupby('driver_id', observed=True, sort=False).tail(DRIVER_STATE_RACES).reset_index(drop=True),
+        constructors=(df_constructors.groupby('constructor_id', observed=True, sort=False)
+                      .tail(CONSTRUCTOR_RACES).reset_index(drop=True)),
+        tracks=df_tracks
+    )
+
+
+def compute_race_features(df_results, state=None):
+    """FEATURE_COLUMNS for every driver of every race of df_results (FEATURES_RESULTS_COLUMNS).
+
+    With `state` (see get_feature_state), df_results only holds the races that
+    follow the ones of the state, and the features carry on from them. The
+    outcome of a race is never used for its own row, so the entrants of an
+    upcoming race (year, round, track_id, driver_id, constructor_id, and grid
+    once qualifying is over) give its pre-race rows: missing columns are left
+    empty. Rows follow the race order of df_results; a driver sharing cars in a
+    race only keeps their best result.
+    """
+    df = _get_driver_results(df_results)
+    df_drivers, df_constructors = df, _get_constructor_races(df)
+    first_row = first_constructor_row = 0
+    if state is not None:
+        # The last results of every driver (constructor) go first, their rows are dropped once the windows are computed
+        df_drivers = pd.concat([state.drivers, df], ignore_index=True)
+        df_constructors = pd.concat([state.constructors, df_constructors], ignore_index=True)
+        first_row, first_constructor_row = len(state.drivers), len(state.constructors)
+
+    drivers = df_drivers['driver_id']
+    position = df_drivers['position'].astype(float)
+    # Pit lane starts (grid 0) have no grid position
+    grid = df_drivers['grid'].astype(float).where(df_drivers['grid'] > 0)
+    finished = df_drivers['position_text'].astype(str).str.isdigit().astype(float)
+
+    # --- Driver form ---
+    df_form = pd.DataFrame({
+        'form_races': drivers.groupby(drivers, observed=True).cumcount().clip(upper=FORM_RACES),
+        'form_position': _rolling_before(position, drivers, FORM_RACES),
+        'form_points': _rolling_before(df_drivers['points'].astype(float), drivers, FORM_RACES),
+        'form_finish_rate': _rolling_before(finished, drivers, FORM_RACES),
+        'form_grid': _rolling_before(grid, drivers, GRID_RACES),
+        'form_positions_gained': _rolling_before(grid - position, drivers, GRID_RACES),
+    })
+    df = pd.concat([df, df_form.iloc[first_row:].reset_index(drop=True)], axis=1)
+
+    # --- Constructor strength ---
+    constructors = df_constructors['constructor_id']
+    df_constructors['constructor_position'] = _rolling_before(df_constructors['position'], constructors, CONSTRUCTOR_RACES)
+    df_constructors['constructor_points'] = _rolling_before(df_constructors['points'], constructors, CONSTRUCTOR_RACES)
+    df_constructors = df_constructors.iloc[first_constructor_row:]
+    df = df.merge(df_constructors[RACE_KEYS + ['constructor_id', 'constructor_position', 'constructor_points']],
+                  on=RACE_KEYS + ['constructor_id'], how='left')
+
+    # --- Track history ---
+    position = df['position'].astype(float)
+    track_groups = [df['driver_id'], df['track_id']]
+    track_positions, df['track_starts'] = _expanding_before(position, track_groups)
+    track_wins, _ = _expanding_before((position == 1).astype(int), track_groups)
+    if state is not None:
+        # Plus the starts, positions and wins at the track before the state
+        df_before = df[['driver_id', 'track_id']].merge(state.tracks, on=['driver_id', 'track_id'], how='left')
+        df['track_starts'] += df_before['starts'].fillna(0).astype(int).to_numpy()
+        track_positions += df_before['positions'].fillna(0).to_numpy()
+        track_wins += df_before['wins'].fillna(0).astype(int).to_numpy()
+    df['track_position'] = track_positions / df['track_starts'].where(df['track_starts'] > 0)
+    df['track_wins'] = track_wins
+
+    return df[FEATURE_COLUMNS]
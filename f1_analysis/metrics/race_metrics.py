@@ -52,6 +52,51 @@ def convert_to_timedelta_column(times):
 
 
 
+# Ergast time strings, parsed in a single regex pass: the winner's race time
+# ("1:34:50.616", "34:50.616"), the gap to the winner in seconds ("+5.478") or
+# minutes ("+1:02.3"). Lapped cars ("+1 Lap") match none of them and have no time.
+RACE_TIME_PATTERN = (
+    r'^(?:(?P<hours>\d+):)?(?P<minutes>\d+):(?P<seconds>\d+)(?:\.(?P<fraction>\d+))?$'
+    r'|^\+(?P<gap_seconds>\d+(?:\.\d*)?)$'
+    r'|^\+(?P<gap_minutes>\d+):(?P<gap_minutes_seconds>\d+)(?:\.(?P<gap_fraction>\d+))?$'
+)
+
+
+def _to_nanoseconds(hours, minutes, seconds, fraction):
+    """Exact nanoseconds from the digit strings of a time (NaN where `seconds` is missing)."""
+    whole_seconds = hours.astype(float).fillna(0) * 3600 + minutes.astype(float) * 60 + seconds.astype(float)
+    fraction = fraction.fillna('').str.slice(0, 9).str.pad(9, side='right', fillchar='0').astype(float)
+    return whole_seconds * 1_000_000_000 + fraction
+
+
+def parse_race_times(times, race_ids=None):
+    """Vectorized convert_to_timedelta_column for whole columns.
+
+    `race_ids` tells which rows belong to the same race (a whole season or the
+    whole history can be parsed at once), without it the column is one race.
+    Relative gaps are added to the first absolute time of their race, so the
+    result is the same leader-relative timedelta as convert_to_timedelta_column.
+    Lapped ("+N Laps") and missing entries have no time and come back as NaT.
+    """
+    times = pd.Series(times)
+    if race_ids is None:
+        race_ids = np.zeros(len(times), dtype=int)
+
+    parts = times.astype('string').str.extract(RACE_TIME_PATTERN)
+    no_hours = pd.Series(np.nan, index=times.index)
+
+    absolute_ns = _to_nanoseconds(parts['hours'], parts['minutes'], parts['seconds'], parts['fraction'])
+    leader_ns = absolute_ns.groupby(np.asarray(race_ids)).transform('first')
+
+    # Same truncation as pd.Timedelta(seconds=...) so the results match to the nanosecond
+    gap_ns = np.trunc(parts['gap_seconds'].astype(float) * 1_000_000_000)
+    gap_ns = gap_ns.fillna(_to_nanoseconds(
+        no_hours, parts['gap_minutes'], parts['gap_minutes_seconds'], parts['gap_fraction']
+    ))
+
+    return pd.to_timedelta(absolute_ns.fillna(leader_ns + gap_ns), unit='ns')
+
+
 def get_position_interval(time_series):
     return time_series.diff().dt.total_seconds()
 
@@ -64,8 +109,39 @@ def compute_gini_coefficient(values):
         raise ValueError("Negative values not allowed in Gini calculation.")
     array = np.sort(array)
     n = len(array)
-    cum_diffs = np.abs(array[:, None] - array).sum()
+    # sum of |x_i - x_j| over all pairs from the sorted values, O(n log n) instead of the n x n matrix
+    cum_diffs = 2 * ((2 * np.arange(1, n + 1) - n - 1) * array).sum()
     mean = array.mean()
     if mean == 0:
         return 0
-    return 1 - (cum_diffs / (2 * n**2 * mean))
\ No newline at end of file
+    return 1 - (cum_diffs / (2 * n**2 * mean))
+
+
+def compute_grouped_gini_coefficient(df, by, value):
+    """compute_gini_coefficient of `value` for every group of `by` in one vectorized call.
+
+    `by` is one or more columns of df (seasons, tracks, decades, windows...),
+    the result is a Series indexed by group.
+    """
+    if (df[value] < 0).any():
+        raise ValueError("Negative values not allowed in Gini calculation.")
+    by = [by] if isinstance(by, str) else list(by)
+
+    df = df.sort_values(by + [value])
+    # Categorical keys (see store/results_store.py): only the groups present, whatever the pandas version
+    groups = df.groupby(by, sort=False, observed=True)
+    n = groups[value].transform('size')
+    rank = groups.cumcount() + 1
+    cum_diffs = 2 * ((2 * rank - n - 1) * df[value]).groupby([df[col] for col in by], observed=True).sum()
+
+    n = groups.size().sort_index()
+    mean = groups[value].mean().sort_index()
+    gini = 1 - (cum_diffs / (2 * n**2 * mean))
+    return gini.where(mean != 0, 0)
+
+
+def compute_grouped_count_gini(df, by, category):
+    """Gini coefficient of how often each `category` (e.g. winner) appears in every group of `by`."""
+    by = [by] if isinstance(by, str) else list(by)
+    counts = df.groupby(by + [category], observed=True).size().rename('count').reset_index()
+    return compute_grouped_gini_coefficient(counts, by, 'count')
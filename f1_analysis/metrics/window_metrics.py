@@ -0,0 +1,134 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from metrics.history_metrics import RACE_KEYS, TOP_N, compute_races_metrics, get_top_finishers
+
+ROLLING_WINDOW = 20
+
+
+class RunningGini:
+    """Gini coefficient of how often each key occurs, updated one occurrence at a time.
+
+    Same value as compute_gini_coefficient(list(Counter(keys).values())), but
+    adding or removing an occurrence costs O(log max_count) instead of a
+    recomputation: the sum of pairwise count differences is updated from a
+    Fenwick tree holding how many keys have each count.
+    """
+
+    def __init__(self, max_count):
+        self.counts = {}
+        self.tree = [0] * (max_count + 1)
+        self.n = 0
+        self.total = 0
+        self.pair_diffs = 0
+
+    def _update(self, count, delta):
+        while count < len(self.tree):
+            self.tree[count] += delta
+            count += count & -count
+
+    def _keys_up_to(self, count):
+        """Number of keys whose count is <= count."""
+        keys = 0
+        while count > 0:
+            keys += self.tree[count]
+            count -= count & -count
+        return keys
+
+    def add(self, key):
+        count = self.counts.get(key, 0)
+        if count == 0:
+            # every other key has a count >= 1 and gets 1 closer to the new one
+            self.pair_diffs += self.total - self.n
+            self.n += 1
+        else:
+            lower = self._keys_up_to(count) - 1
+            higher = self.n - 1 - lower
+            self.pair_diffs += lower - higher
+            self._update(count, -1)
+        self._update(count + 1, 1)
+        self.counts[key] = count + 1
+        self.total += 1
+
+    def remove(self, key):
+        count = self.counts[key]
+        self._update(count, -1)
+        if count == 1:
+            self.n -= 1
+            self.pair_diffs -= (self.total - 1) - self.n
+            del self.counts[key]
+        else:
+            lower = self._keys_up_to(count - 1)
+            higher = self.n - 1 - lower
+            self.pair_diffs += higher - lower
+            self._update(count - 1, 1)
+            self.counts[key] = count - 1
+        self.total -= 1
+
+    @property
+    def value(self):
+        if self.total == 0:
+            return np.nan
+        # compute_gini_coefficient's 1 - sum|xi - xj| / (2 n^2 mean) with mean = total / n
+        return 1 - self.pair_diffs / (self.n * self.total)
+
+
+def compute_rolling_metrics(df_results, window=ROLLING_WINDOW, top_n=TOP_N):
+    """Competitiveness over the last `window` races, for every race of the history in one linear pass.
+
+    Each race is added to the window and the oldest one dropped, so running
+    sums and Gini coefficients are updated instead of recomputed. Gaps are
+    averaged over the races that have one.
+    """
+    df_races = compute_races_metrics(df_results, top_n)
+    df_top = get_top_finishers(df_results, top_n)
+    # df_top is in race order, so each race's drivers are one contiguous slice
+    race_sizes = df_top.groupby(RACE_KEYS, sort=False).size().to_numpy()
+    top_drivers = np.split(df_top['driver'].to_numpy(), np.cumsum(race_sizes)[:-1])
+
+    winners = RunningGini(window)
+    constructors = RunningGini(window)
+    top_finishers = RunningGini(window)
+    gap_sum = gap_count = position_change_sum = 0
+    in_window = deque()
+
+    rows = []
+    for race, drivers in zip(df_races.itertuples(index=False), top_drivers):
+        in_window.append((race, drivers))
+        if len(in_window) > window:
+            old_race, old_drivers = in_window.popleft()
+            winners.remove(old_race.winner)
+            constructors.remove(old_race.constructor)
+            for driver in old_drivers:
+                top_finishers.remove(driver)
+            if not np.isnan(old_race.average_gap):
+                gap_sum -= old_race.average_gap
+                gap_count -= 1
+            position_change_sum -= old_race.position_change
+
+        winners.add(race.winner)
+        constructors.add(race.constructor)
+        for driver in drivers:
+            top_finishers.add(driver)
+        if not np.isnan(race.average_gap):
+            gap_sum += race.average_gap
+            gap_count += 1
+        position_change_sum += race.position_change
+
+        rows.append({
+            'year': race.year,
+            'round': race.round,
+            'track_id': race.track_id,
+            'track_name': race.track_name,
+            'races_in_window': len(in_window),
+            'average_gap': gap_sum / gap_count if gap_count else np.nan,
+            'average_position_change': position_change_sum / len(in_window),
+            'winner_drivers_gini': winners.value,
+            'winner_constructors_gini': constructors.value,
+            f'top{top_n}_drivers_gini': top_finishers.value,
+            f'top{top_n}_distinct_drivers': top_finishers.n,
+        })
+
+    return pd.DataFrame(rows)
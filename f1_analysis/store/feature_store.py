@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import pandas as pd
+
+from metrics.history_metrics import RACE_KEYS
+from metrics.race_features import FEATURE_KEYS, FEATURES_RESULTS_COLUMNS, compute_race_features, get_feature_state
+from store.results_store import RESULTS_STORE_DIR, read_results
+
+# Pre-race features of metrics/race_features.py keyed by (year, round, driver_id),
+# kept as append-only versions: feature_store/v1/0001.parquet, 0002.parquet, ...
+# Each update only adds the rows of the races that were not in the store yet, and
+# a row is never rewritten once stored, so version N is exactly what a model
+# trained at version N saw.
+FEATURE_STORE_DIR = Path("feature_store")
+
+# Bump when the feature definitions change: the new set is built from scratch
+# in its own directory, next to the previous one
+FEATURE_SET_VERSION = 1
+
+CATEGORICAL_COLUMNS = ['driver_id', 'track_id', 'constructor_id']
+
+# Outcomes joined to the features by read_training_set
+TARGET_COLUMNS = ['position', 'position_text', 'points']
+
+
+def _set_dir(store_dir, feature_set):
+    return Path(store_dir) / f"v{feature_set}"
+
+
+def get_versions(store_dir=FEATURE_STORE_DIR, feature_set=FEATURE_SET_VERSION):
+    return sorted(int(path.stem) for path in _set_dir(store_dir, feature_set).glob("*.parquet"))
+
+
+def read_features(columns=None, years=None, version=None, store_dir=FEATURE_STORE_DIR, feature_set=FEATURE_SET_VERSION):
+    """Stored features, restricted to `columns` and `years`, as of `version` (the latest by default)."""
+    versions = [v for v in get_versions(store_dir, feature_set) if version is None or v <= version]
+    filters = [('year', 'in', list(years))] if years is not None else None
+    frames = [
+        pd.read_parquet(_set_dir(store_dir, feature_set) / f"{v:04d}.parquet", columns=columns, filters=filters)
+        for v in versions
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({column: 'category' for column in CATEGORICAL_COLUMNS if column in df})
+
+
+def write_features(df_features, store_dir=FEATURE_STORE_DIR, feature_set=FEATURE_SET_VERSION):
+    """Store the rows of df_features whose keys are not stored yet as a new version.
+
+    Returns the new version, None when there was nothing new.
+    """
+    df_stored = read_features(FEATURE_KEYS, store_dir=store_dir, feature_set=feature_set)
+    stored = pd.MultiIndex.from_frame(df_stored.astype({'driver_id': object}))
+    df_new = df_features.loc[~pd.MultiIndex.from_frame(df_features[FEATURE_KEYS].astype({'driver_id': object})).isin(stored)]
+    if df_new.empty:
+        return None
+
+    versions = get_versions(store_dir, feature_set)
+    version = versions[-1] + 1 if versions else 1
+    path = _set_dir(store_dir, feature_set) / f"{version:04d}.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    df_new.astype({column: 'category' for column in CATEGORICAL_COLUMNS}).to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+    return version
+
+
+def _is_before(df, year, round_number):
+    return (df['year'] < year) | ((df['year'] == year) & (df['round'] < round_number))
+
+
+def update_features(store_dir=FEATURE_STORE_DIR, results_store_dir=RESULTS_STORE_DIR, feature_set=FEATURE_SET_VERSION):
+    """Store the features of the races of the results store that are not in the feature store yet.
+
+    Only the races from the first missing one on are computed, carrying on from
+    the state of the races before it. Returns the new version, None when there
+    was nothing new.
+    """
+    df_results = read_results(FEATURES_RESULTS_COLUMNS, store_dir=results_store_dir)
+    stored = pd.MultiIndex.from_frame(read_features(RACE_KEYS, store_dir=store_dir, feature_set=feature_set))
+    races = df_results[RACE_KEYS].drop_duplicates()
+    missing = races.loc[~pd.MultiIndex.from_frame(races).isin(stored)]
+    if missing.empty:
+        return None
+
+    year, round_number = min(missing.itertuples(index=False, name=None))
+    before = _is_before(df_results, year, round_number)
+    df_features = compute_race_features(df_results.loc[~before], get_feature_state(df_results.loc[before]))
+    return write_features(df_features, store_dir, feature_set)
+
+
+def read_race_features(year, round_number, version=None, store_dir=FEATURE_STORE_DIR):
+    """Stored features of the drivers of a race already in the results store (see build_race_features before it)."""
+    df = read_features(years=[year], version=version, store_dir=store_dir)
+    return df.loc[df['round'] == round_number].reset_index(drop=True)
+
+
+def build_race_features(df_entrants, results_store_dir=RESULTS_STORE_DIR):
+    """Pre-race features of the entrants of an upcoming race, to score it.
+
+    df_entrants has one row per driver with year, round, track_id, driver_id,
+    constructor_id and, once qualifying is over, grid (left empty without it).
+    The features come from the results of the races before it only.
+    """
+    year, round_number = df_entrants[RACE_KEYS].iloc[0]
+    df_results = read_results(FEATURES_RESULTS_COLUMNS, store_dir=results_store_dir)
+    state = get_feature_state(df_results.loc[_is_before(df_results, year, round_number)])
+    return compute_race_features(df_entrants, state)
+
+
+def read_training_set(years=None, version=None, store_dir=FEATURE_STORE_DIR, results_store_dir=RESULTS_STORE_DIR):
+    """Features as of `version` with the outcome of their race (TARGET_COLUMNS).
+
+    The outcomes come from the results store and are only joined here: the
+    features themselves never depend on the race they describe.
+    """
+    df_features = read_features(years=years, version=version, store_dir=store_dir)
+    df_targets = (read_results(FEATURE_KEYS + TARGET_COLUMNS, years, results_store_dir)
+                  .sort_values(FEATURE_KEYS[:-1] + ['position'], kind='stable')
+                  .drop_duplicates(FEATURE_KEYS))
+    df = df_features.astype({'driver_id': object}).merge(df_targets.astype({'driver_id': object}), on=FEATURE_KEYS, how='left')
+    return df.astype({'driver_id': 'category'})
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Lap-by-lap positions and pit stops of every race, one Parquet file per table and season:
+# laps_store/laps/1996.parquet, laps_store/pitstops/2011.parquet, ...
+# Files are zstd-compressed and hold one row group per race, so a season is
+# written one race at a time and read back one season (and a few columns) at a time.
+LAPS_STORE_DIR = Path("laps_store")
+COMPRESSION = 'zstd'
+
+_DRIVER_ID = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMAS = {
+    'laps': pa.schema([
+        ('year', pa.int16()),
+        ('round', pa.int8()),
+        ('driver_id', _DRIVER_ID),
+        ('lap', pa.int16()),
+        ('position', pa.int8()),
+        ('milliseconds', pa.int32()),
+    ]),
+    'pitstops': pa.schema([
+        ('year', pa.int16()),
+        ('round', pa.int8()),
+        ('driver_id', _DRIVER_ID),
+        ('stop', pa.int8()),
+        ('lap', pa.int16()),
+        ('milliseconds', pa.int32()),
+    ]),
+}
+
+
+def _year_path(table, year, store_dir):
+    return Path(store_dir) / table / f"{year}.parquet"
+
+
+def get_stored_years(table, store_dir=LAPS_STORE_DIR):
+    return sorted(int(path.stem) for path in (Path(store_dir) / table).glob("*.parquet"))
+
+
+class SeasonWriter:
+    """Stream the races of one season into the store, one row group per race.
+
+    Only one race is in memory at a time. The season is written next to its
+    files and replaces them when the block exits without error, so an
+    interrupted ingest leaves the previous version of the season in place.
+
+        with SeasonWriter(2024) as writer:
+            for ...:
+                writer.write_race('laps', df_laps)
+    """
+
+    def __init__(self, year, store_dir=LAPS_STORE_DIR):
+        self.year = year
+        self.store_dir = Path(store_dir)
+        self.writers = {}
+
+    def _tmp_path(self, table):
+        return _year_path(table, self.year, self.store_dir).with_suffix('.tmp')
+
+    def write_race(self, table, df):
+        if df.empty:
+            return
+        if table not in self.writers:
+            self._tmp_path(table).parent.mkdir(parents=True, exist_ok=True)
+            self.writers[table] = pq.ParquetWriter(self._tmp_path(table), SCHEMAS[table], compression=COMPRESSION)
+        schema = SCHEMAS[table]
+        self.writers[table].write_table(pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        for writer in self.writers.values():
+            writer.close()
+        for table in SCHEMAS:
+            path = _year_path(table, self.year, self.store_dir)
+            if exc_type is not None:
+                self._tmp_path(table).unlink(missing_ok=True)
+            elif table in self.writers:
+                self._tmp_path(table).replace(path)
+            else:
+                # The new version of the season has nothing for this table
+                path.unlink(missing_ok=True)
+        return False
+
+
+def read_table(table, columns=None, years=None, store_dir=LAPS_STORE_DIR):
+    """Rows of `table` ('laps' or 'pitstops') for the stored seasons, restricted to `columns` and `years`.
+
+    driver_id comes back categorical; milliseconds is a float column, NaN where
+    Ergast has no time.
+    """
+    stored_years = get_stored_years(table, store_dir)
+    if years is not None:
+        years = set(years)
+        stored_years = [year for year in stored_years if year in years]
+
+    frames = [pd.read_parquet(_year_path(table, year, store_dir), columns=columns) for year in stored_years]
+    if not frames:
+        return pd.DataFrame(columns=columns or SCHEMAS[table].names)
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({'driver_id': 'category'}) if 'driver_id' in df else df
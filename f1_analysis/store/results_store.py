@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pandas as pd
+
+# Full classification of every race (all drivers, not only the top 5), one
+# Parquet file per season: results_store/1950.parquet, results_store/1951.parquet, ...
+# Every F1 metric can be recomputed from here without fetching anything.
+RESULTS_STORE_DIR = Path("results_store")
+
+# Repeated strings are stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ['track_id', 'track_name', 'driver_id', 'driver', 'constructor_id', 'constructor', 'status']
+NULLABLE_INT_COLUMNS = ['milliseconds', 'fastest_lap', 'fastest_lap_rank']
+
+RESULTS_SORT_KEYS = ['year', 'round', 'position']
+
+
+def _year_path(year, store_dir):
+    return Path(store_dir) / f"{year}.parquet"
+
+
+def get_stored_years(store_dir=RESULTS_STORE_DIR):
+    return sorted(int(path.stem) for path in Path(store_dir).glob("*.parquet"))
+
+
+def to_store_types(df_results):
+    df = df_results.copy()
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    for column in NULLABLE_INT_COLUMNS:
+        df[column] = df[column].astype('Int64')
+    return df
+
+
+def write_results(df_results, store_dir=RESULTS_STORE_DIR, replace_seasons=False):
+    """Upsert races into the store: rounds already stored for a season are replaced.
+
+    With replace_seasons the seasons in df_results are rewritten from scratch
+    instead. Only those seasons are touched, each one atomically.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    for year, df_year in df_results.groupby('year'):
+        path = _year_path(year, store_dir)
+        if path.exists() and not replace_seasons:
+            df_stored = pd.read_parquet(path)
+            df_stored = df_stored.loc[~df_stored['round'].isin(df_year['round'].unique())]
+            # Categories differ from one frame to the other, concat them as plain strings
+            df_year = pd.concat([
+                df.astype({column: object for column in CATEGORICAL_COLUMNS}) for df in (df_stored, df_year)
+            ], ignore_index=True)
+
+        df_year = to_store_types(df_year).sort_values(RESULTS_SORT_KEYS, kind='stable').reset_index(drop=True)
+        tmp_path = path.with_suffix('.tmp')
+        df_year.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+
+
+def read_results(columns=None, years=None, store_dir=RESULTS_STORE_DIR):
+    """Results of the stored seasons, restricted to `columns` and `years`.
+
+    Only the files of the requested seasons are opened and only the requested
+    columns are read from them.
+    """
+    stored_years = get_stored_years(store_dir)
+    if years is not None:
+        years = set(years)
+        stored_years = [year for year in stored_years if year in years]
+
+    frames = [pd.read_parquet(_year_path(year, store_dir), columns=columns) for year in stored_years]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    # Each file has its own categories, union them so the columns stay categorical
+    return pd.concat(frames, ignore_index=True).astype(
+        {column: 'category' for column in CATEGORICAL_COLUMNS if columns is None or column in columns}
+    )
@@ -0,0 +1,64 @@
+// Clientside callbacks of the CLIENTSIDE mode of visual_track_metrics.py: the figures
+// are drawn in the browser from the per-track data of the 'tracks-data' store.
+(function () {
+    function layout(data, title, xTitle, yTitle) {
+        return {
+            template: data.template,
+            title: {text: title},
+            xaxis: {title: {text: xTitle}},
+            yaxis: {title: {text: yTitle}},
+            barmode: 'relative',
+            legend: {tracegroupgap: 0}
+        };
+    }
+
+    function line(data, x, y, xTitle, yTitle, title) {
+        const figure = {data: [{type: 'scatter', mode: 'lines', x: x, y: y}], layout: layout(data, title, xTitle, yTitle)};
+        figure.layout.xaxis.tickangle = 45;
+        return figure;
+    }
+
+    function bar(data, x, y, xTitle, title) {
+        return {
+            data: [{type: 'bar', x: x, y: y, text: y, textposition: 'outside'}],
+            layout: layout(data, title, xTitle, 'wins')
+        };
+    }
+
+    // Bins are precomputed on the server, see get_histogram
+    function histogram(data, bins, xTitle, title) {
+        const figure = {
+            data: [{type: 'bar', x: bins[xTitle], y: bins.count, width: bins.width}],
+            layout: layout(data, title, xTitle, 'count')
+        };
+        figure.layout.bargap = 0;
+        return figure;
+    }
+
+    function pie(data, labels, values, title) {
+        return {
+            data: [{type: 'pie', labels: labels, values: values, textposition: 'outside'}],
+            layout: {template: data.template, title: {text: title}, legend: {tracegroupgap: 0}}
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        tracks: {
+            update_graphs: function (selectedTrack, data) {
+                const track = data.tracks[selectedTrack];
+                const races = track.races;
+                return [
+                    bar(data, track.driver_wins.driver, track.driver_wins.wins, 'driver', 'Driver Victories'),
+                    bar(data, track.constructor_wins.constructor, track.constructor_wins.wins, 'constructor',
+                        'Constructor Victories'),
+                    line(data, races.year, races.average_gap, 'year', 'average_gap', 'Average Gap by Year'),
+                    histogram(data, track.average_gap_histogram, 'average_gap', 'Distribution of Average Gap'),
+                    line(data, races.year, races.position_change, 'year', 'position_change', 'Position Change by Year'),
+                    histogram(data, track.position_change_histogram, 'position_change', 'Distribution of Position Change'),
+                    line(data, races.year, races.grid, 'year', 'grid', 'Grid Position of Winners by Year'),
+                    pie(data, track.grid_wins.grid, track.grid_wins.wins, 'Grid Victories')
+                ];
+            }
+        }
+    });
+})();
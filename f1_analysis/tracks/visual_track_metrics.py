@@ -1,11 +1,28 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, ClientsideFunction
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
+import sys
+from pathlib import Path
+
+# The data layer is shared with the season dashboard, one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dashboard_data import load_table, get_track_rows, to_columns, get_counts
+
+# Send every track to the browser once (dcc.Store) and draw the figures with the
+# clientside callbacks of assets/clientside.js: changing track needs no server request
+CLIENTSIDE = False
+
+# Bins of the gap and position change distributions: HISTOGRAM_BINS equal bins
+# spanning the values of the track, not the rounded bin sizes plotly's nbins
+# picks, so the bars differ from the former px.histogram(nbins=10)
+HISTOGRAM_BINS = 10
 
 # Load the data
-df = pd.read_csv("../df_races_metrics.csv")
+df = load_table('races_metrics')
 
 # Initialize Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -15,6 +32,45 @@ app.title = "F1 Tracks Metrics"
 # Get list of available tracks
 tracks = sorted(df['track_name'].unique())
 
+
+def get_histogram(series, name, bins=HISTOGRAM_BINS):
+    """Counts of the non missing values in `bins` equal bins, one row per bin."""
+    values = series.dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame({name: [], 'count': [], 'width': []})
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({name: (edges[:-1] + edges[1:]) / 2, 'count': counts, 'width': np.diff(edges)})
+
+
+def create_track_aggregates(track_name):
+    """Every table the graphs of a track are drawn from."""
+    dff = get_track_rows(track_name)
+    return {
+        'races': dff[['year', 'average_gap', 'position_change', 'grid']].reset_index(drop=True),
+        'driver_wins': get_counts(dff['winner'], 'driver'),
+        'constructor_wins': get_counts(dff['constructor'], 'constructor'),
+        'grid_wins': get_counts(dff['grid'], 'grid'),
+        'average_gap_histogram': get_histogram(dff['average_gap'], 'average_gap'),
+        'position_change_histogram': get_histogram(dff['position_change'], 'position_change'),
+    }
+
+
+# Computed once at startup, so the callback is a lookup whatever the size of the history
+track_aggregates = {track_name: create_track_aggregates(track_name) for track_name in tracks}
+
+
+def create_client_data():
+    """Everything the clientside callbacks need, aggregated per track."""
+    return {
+        # The plotly express look, applied by the browser
+        'template': pio.templates['plotly'].to_plotly_json(),
+        'tracks': {
+            track_name: {table: to_columns(df_table, df_table.columns) for table, df_table in aggregates.items()}
+            for track_name, aggregates in track_aggregates.items()
+        }
+    }
+
+
 # App layout
 app.layout = html.Div([
     html.Div([
@@ -46,33 +102,42 @@ app.layout = html.Div([
     dbc.Row([
         dbc.Col(dcc.Graph(id='grid-timeseries'), width=6),
         dbc.Col(dcc.Graph(id='grid-dist'), width=6),
-    ])
+    ]),
+
+    dcc.Store(id='tracks-data', data=create_client_data() if CLIENTSIDE else None)
 ])
 
-# Callbacks
-@app.callback(
-    Output('driver-victories', 'figure'),
-    Output('constructor-victories', 'figure'),
-    Output('avg-gap-timeseries', 'figure'),
-    Output('avg-gap-dist', 'figure'),
-    Output('pos-change-timeseries', 'figure'),
-    Output('pos-change-dist', 'figure'),
-    Output('grid-timeseries', 'figure'),
-    Output('grid-dist', 'figure'),
-    Input('track-dropdown', 'value')
-)
+GRAPH_IDS = [
+    'driver-victories',
+    'constructor-victories',
+    'avg-gap-timeseries',
+    'avg-gap-dist',
+    'pos-change-timeseries',
+    'pos-change-dist',
+    'grid-timeseries',
+    'grid-dist'
+]
+
+
+def histogram_figure(df_histogram, x, title):
+    """Bar chart of a precomputed histogram, drawn like px.histogram."""
+    fig = px.bar(df_histogram, x=x, y='count', title=title)
+    fig.update_traces(width=df_histogram['width'])
+    fig.update_layout(bargap=0)
+    return fig
+
+
 def update_graphs(selected_track):
-    dff = df[df['track_name'] == selected_track]
+    aggregates = track_aggregates[selected_track]
+    dff = aggregates['races']
 
     # Bar chart: driver victories
-    driver_counts = dff['winner'].value_counts().reset_index()
-    driver_counts.columns = ['driver', 'wins']
+    driver_counts = aggregates['driver_wins']
     fig_driver_wins = px.bar(driver_counts, x='driver', y='wins', title='Driver Victories', text='wins')
     fig_driver_wins.update_traces(textposition='outside')
 
     # Bar chart: constructor wins
-    constructor_counts = dff['constructor'].value_counts().reset_index()
-    constructor_counts.columns = ['constructor', 'wins']
+    constructor_counts = aggregates['constructor_wins']
     fig_constructor_wins = px.bar(constructor_counts, x='constructor', y='wins', title='Constructor Victories', text='wins')
     fig_constructor_wins.update_traces(textposition='outside')
 
@@ -81,22 +146,23 @@ def update_graphs(selected_track):
     fig_avg_gap_ts.update_xaxes(tickangle=45)
 
     # Distribution: average gap
-    fig_avg_gap_dist = px.histogram(dff, x='average_gap', nbins=10, title='Distribution of Average Gap')
+    fig_avg_gap_dist = histogram_figure(aggregates['average_gap_histogram'], 'average_gap', 'Distribution of Average Gap')
 
     # Timeseries: position change
     fig_pos_change_ts = px.line(dff, x='year', y='position_change', title='Position Change by Year')
     fig_pos_change_ts.update_xaxes(tickangle=45)
 
     # Distribution: position change
-    fig_pos_change_dist = px.histogram(dff, x='position_change', nbins=10, title='Distribution of Position Change')
+    fig_pos_change_dist = histogram_figure(
+        aggregates['position_change_histogram'], 'position_change', 'Distribution of Position Change'
+    )
 
     # Timeseries: position change
     fig_grid_ts = px.line(dff, x='year', y='grid', title='Grid Position of Winners by Year')
     fig_grid_ts.update_xaxes(tickangle=45)
 
     # Bar chart: grid position
-    grid_counts = dff['grid'].value_counts().reset_index()
-    grid_counts.columns = ['grid', 'wins']
+    grid_counts = aggregates['grid_wins']
     #fig_constructor_ratio = px.pie(dff_constructors_standings, values='points', names='constructor_id', title='Constructor points')
     #fig_constructor_ratio.update_traces(textposition='outside')
     fig_grid_wins = px.pie(grid_counts, values='wins', names='grid', title='Grid Victories')
@@ -118,6 +184,20 @@ def update_graphs(selected_track):
     )
 
 
+# Callbacks
+if CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace='tracks', function_name='update_graphs'),
+        [Output(graph_id, 'figure') for graph_id in GRAPH_IDS],
+        Input('track-dropdown', 'value'),
+        State('tracks-data', 'data')
+    )
+else:
+    app.callback(
+        [Output(graph_id, 'figure') for graph_id in GRAPH_IDS],
+        Input('track-dropdown', 'value')
+    )(update_graphs)
+
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
@@ -1,14 +1,54 @@
 import dash
-from dash import dcc, html, Input, Output, callback_context
+from dash import dcc, html, Input, Output, State, ClientsideFunction, callback_context
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
+from functools import lru_cache
+from dashboard_data import load_table, get_year_rows, get_data_version, to_columns, get_counts
+
+# Figures of the last FIGURE_CACHE_SIZE selections are kept in memory, so a
+# year that was already viewed is served without touching the DataFrames.
+# The cache is dropped whenever one of the csvs changes on disk.
+FIGURE_CACHE_SIZE = 128
+# Compute the figures of every selection when the app starts
+WARM_UP_CACHE = False
+
+# Send every year to the browser once (dcc.Store) and draw the figures with the
+# clientside callbacks of assets/clientside.js: changing year needs no server request.
+# The data is the one of the csvs when the app starts.
+CLIENTSIDE = False
+
+# Drivers (constructors) of the final top N shown in the title fight graphs,
+# drawn once main_season_standings.py has written the standings progression
+PROGRESSION_TOP_N = 5
+
+# (progression table, id column, name column, title)
+TITLE_FIGHTS = [
+    ('drivers_progression', 'driver_id', 'driver', "Drivers' Title Fight"),
+    ('constructors_progression', 'constructor_id', 'constructor', "Constructors' Title Fight"),
+]
+
+data_version = None
+
+
+def load_data():
+    """(Re)load the tables (see dashboard_data.py) if they changed since the last call and return their version."""
+    global df, df_drivers_standings, df_constructors_standings, df_all, data_version
+    version = get_data_version()
+    if version != data_version:
+        df = load_table('races_metrics')
+        df_drivers_standings = load_table('drivers_standings')
+        df_constructors_standings = load_table('constructors_standings')
+        df_all = load_table('season_metrics')
+        if data_version is not None:
+            get_figures.cache_clear()
+        data_version = version
+    return version
+
 
 # Load the data
-df = pd.read_csv("df_races_metrics.csv")
-df_drivers_standings = pd.read_csv("df_drivers_standings.csv")
-df_constructors_standings = pd.read_csv("df_constructors_standings.csv")
-df_all = pd.read_csv("df_season_metrics.csv")
+load_data()
 
 # Initialize Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -18,6 +58,59 @@ app.title = "F1 Race Metrics"
 # Get list of available years
 years = sorted(df['year'].unique())
 
+
+def get_title_fight(selected_year, name, key, label):
+    """Points after every round of the final top PROGRESSION_TOP_N of a season, None without progression data.
+
+    There is no constructors' championship before 1958, so those seasons have no constructors' rows.
+    """
+    if load_table(name) is None:
+        return None
+    dff = get_year_rows(name, selected_year)
+    if dff.empty:
+        return None
+    contenders = dff.loc[dff['round'] == dff['round'].max()].nsmallest(PROGRESSION_TOP_N, 'position')[key]
+    return dff.loc[dff[key].isin(contenders), ['round', label, 'points']].astype({label: object})
+
+
+def create_year_client_data(year):
+    dff = get_year_rows('races_metrics', year)
+    data = {
+        'races': to_columns(dff, ['track_name', 'average_gap', 'position_change']),
+        'driver_wins': to_columns(get_counts(dff['winner'], 'driver'), ['driver', 'wins']),
+        'constructor_wins': to_columns(get_counts(dff['constructor'], 'constructor'), ['constructor', 'wins']),
+        'driver_points': to_columns(get_year_rows('drivers_standings', year), ['driver_id', 'points']),
+        'constructor_points': to_columns(get_year_rows('constructors_standings', year), ['constructor_id', 'points']),
+    }
+    for name, key, label, _ in TITLE_FIGHTS:
+        df_fight = get_title_fight(year, name, key, label)
+        if df_fight is not None:
+            data[f'{label}s_title_fight'] = to_columns(df_fight, ['round', label, 'points'])
+    return data
+
+
+def create_client_data():
+    """Everything the clientside callbacks need, aggregated per year."""
+    return {
+        # The plotly express look, applied by the browser
+        'template': pio.templates['plotly'].to_plotly_json(),
+        'all': to_columns(df_all, ['year', 'average_gaps', 'average_position_change',
+                                   'winner_drivers_gini', 'winner_constructors_gini']),
+        'years': {str(year): create_year_client_data(year) for year in years}
+    }
+
+
+def create_clientside_graphs():
+    """Fixed graph slots filled in by the browser, rows and title fights without figures are hidden."""
+    return [
+        dcc.Store(id='season-data', data=create_client_data()),
+        dbc.Container([
+            dbc.Row([dbc.Col(dcc.Graph(id=f'graph-{2 * row + col}'), width=6) for col in range(2)], id=f'graphs-row-{row}')
+            for row in range(5)
+        ])
+    ]
+
+
 #App layout
 app.layout = html.Div([
     html.Div([
@@ -31,78 +124,98 @@ app.layout = html.Div([
         )
     ], style={'display': 'flex', 'justifyContent': 'flex-end', 'padding': '10px 20px'}),
 
-    html.Div(id='graphs-container')
+    html.Div(id='graphs-container', children=create_clientside_graphs() if CLIENTSIDE else None)
 ])
 
-# Callbacks
-@app.callback(
-    Output('graphs-container', 'children'),
-    Input('year-dropdown', 'value')
-)
-def render_layout(selected_year):
-    if selected_year == 'all':
-        # Plot for 'All'
-        fig_avg_gap_all = px.line(df_all, x='year', y='average_gaps', title='Average Gap Over Years')
-        fig_pos_change_all = px.line(df_all, x='year', y='average_position_change', title='Average Position Change Over Years')
-        fig_gini_driver_all = px.line(df_all, x='year', y='winner_drivers_gini', title='Gini Index for Driver Winners')
-        fig_gini_constructor_all = px.line(df_all, x='year', y='winner_constructors_gini', title='Gini Index for Constructor Winners')
-
-        return dbc.Container([
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_avg_gap_all), width=6),
-                dbc.Col(dcc.Graph(figure=fig_pos_change_all), width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_gini_driver_all), width=6),
-                dbc.Col(dcc.Graph(figure=fig_gini_constructor_all), width=6)
-            ])
-        ])
 
-    else:
-        dff = df[df['year'] == selected_year]
-        dff_drivers_standings = df_drivers_standings[df_drivers_standings['year'] == selected_year]
-        dff_constructors_standings = df_constructors_standings[df_constructors_standings['year'] == selected_year]
+def create_all_years_figures():
+    fig_avg_gap_all = px.line(df_all, x='year', y='average_gaps', title='Average Gap Over Years')
+    fig_pos_change_all = px.line(df_all, x='year', y='average_position_change', title='Average Position Change Over Years')
+    fig_gini_driver_all = px.line(df_all, x='year', y='winner_drivers_gini', title='Gini Index for Driver Winners')
+    fig_gini_constructor_all = px.line(df_all, x='year', y='winner_constructors_gini', title='Gini Index for Constructor Winners')
 
-        fig_driver_ratio = px.pie(dff_drivers_standings, values='points', names='driver_id', title='Drivers points')
-        fig_constructor_ratio = (
-            px.pie(dff_constructors_standings, values='points', names='constructor_id', title='Constructor points')
-            if not dff_constructors_standings.empty else
-            px.pie(names=["No data"], values=[1], title="Constructor points")
-        )
+    return [fig_avg_gap_all, fig_pos_change_all, fig_gini_driver_all, fig_gini_constructor_all]
 
-        driver_counts = dff['winner'].value_counts().reset_index()
-        driver_counts.columns = ['driver', 'wins']
-        fig_driver_wins = px.bar(driver_counts, x='driver', y='wins', title='Driver Victories', text='wins')
-
-        constructor_counts = dff['constructor'].value_counts().reset_index()
-        constructor_counts.columns = ['constructor', 'wins']
-        fig_constructor_wins = px.bar(constructor_counts, x='constructor', y='wins', title='Constructor Victories', text='wins')
-
-        fig_avg_gap_ts = px.line(dff, x='track_name', y='average_gap', title='Average Gap by Track')
-        fig_avg_gap_dist = px.histogram(dff, x='average_gap', nbins=10, title='Distribution of Average Gap')
-
-        fig_pos_change_ts = px.line(dff, x='track_name', y='position_change', title='Position Change by Track')
-        fig_pos_change_dist = px.histogram(dff, x='position_change', nbins=10, title='Distribution of Position Change')
-
-        return dbc.Container([
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_driver_ratio), width=6),
-                dbc.Col(dcc.Graph(figure=fig_constructor_ratio), width=6),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_driver_wins), width=6),
-                dbc.Col(dcc.Graph(figure=fig_constructor_wins), width=6),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_avg_gap_ts), width=6),
-                dbc.Col(dcc.Graph(figure=fig_avg_gap_dist), width=6),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_pos_change_ts), width=6),
-                dbc.Col(dcc.Graph(figure=fig_pos_change_dist), width=6),
-            ])
-        ])
 
+def create_year_figures(selected_year):
+    dff = get_year_rows('races_metrics', selected_year)
+    dff_drivers_standings = get_year_rows('drivers_standings', selected_year)
+    dff_constructors_standings = get_year_rows('constructors_standings', selected_year)
+
+    fig_driver_ratio = px.pie(dff_drivers_standings, values='points', names='driver_id', title='Drivers points')
+    fig_constructor_ratio = (
+        px.pie(dff_constructors_standings, values='points', names='constructor_id', title='Constructor points')
+        if not dff_constructors_standings.empty else
+        px.pie(names=["No data"], values=[1], title="Constructor points")
+    )
+
+    driver_counts = get_counts(dff['winner'], 'driver')
+    fig_driver_wins = px.bar(driver_counts, x='driver', y='wins', title='Driver Victories', text='wins')
+
+    constructor_counts = get_counts(dff['constructor'], 'constructor')
+    fig_constructor_wins = px.bar(constructor_counts, x='constructor', y='wins', title='Constructor Victories', text='wins')
+
+    fig_avg_gap_ts = px.line(dff, x='track_name', y='average_gap', title='Average Gap by Track')
+    fig_avg_gap_dist = px.histogram(dff, x='average_gap', nbins=10, title='Distribution of Average Gap')
+
+    fig_pos_change_ts = px.line(dff, x='track_name', y='position_change', title='Position Change by Track')
+    fig_pos_change_dist = px.histogram(dff, x='position_change', nbins=10, title='Distribution of Position Change')
+
+    figures = [
+        fig_driver_ratio, fig_constructor_ratio,
+        fig_driver_wins, fig_constructor_wins,
+        fig_avg_gap_ts, fig_avg_gap_dist,
+        fig_pos_change_ts, fig_pos_change_dist
+    ]
+
+    for name, key, label, title in TITLE_FIGHTS:
+        df_fight = get_title_fight(selected_year, name, key, label)
+        if df_fight is not None:
+            figures.append(px.line(df_fight, x='round', y='points', color=label, title=title))
+
+    return figures
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def get_figures(selected_year, version):
+    """Serialized figures of a selection, computed once per version of the csvs.
+
+    The version is part of the key so that a request still running on the
+    previous data cannot put stale figures back in the cache.
+    """
+    figures = create_all_years_figures() if selected_year == 'all' else create_year_figures(selected_year)
+    return tuple(fig.to_dict() for fig in figures)
+
+
+def render_layout(selected_year):
+    figures = get_figures(selected_year, load_data())
+
+    # Two graphs per row
+    return dbc.Container([
+        dbc.Row([dbc.Col(dcc.Graph(figure=figure), width=6) for figure in figures[i:i + 2]])
+        for i in range(0, len(figures), 2)
+    ])
+
+
+# Callbacks
+if CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace='season', function_name='render'),
+        [Output(f'graph-{i}', 'figure') for i in range(10)] + [Output(f'graphs-row-{row}', 'style') for row in (2, 3, 4)]
+        + [Output('graph-9', 'style')],
+        Input('year-dropdown', 'value'),
+        State('season-data', 'data')
+    )
+else:
+    app.callback(
+        Output('graphs-container', 'children'),
+        Input('year-dropdown', 'value')
+    )(render_layout)
+
+
+if WARM_UP_CACHE and not CLIENTSIDE:
+    for selection in ['all'] + years:
+        get_figures(selection, load_data())
 
 
 if __name__ == '__main__':
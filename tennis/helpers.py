@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import re
+from functools import lru_cache
 
 
 def get_games_differences(score_string):
@@ -44,4 +45,96 @@ def get_winner_games(score: str) -> float:
             total += int(w)
         except ValueError:
             continue
-    return total
\ No newline at end of file
+    return total
+
+
+# --- STRUCTURED SCORES ---
+SET_COLUMNS = ['score', 'set', 'winner_games', 'loser_games', 'tiebreak', 'retired', 'walkover', 'default']
+
+
+@lru_cache(maxsize=None)
+def parse_score(score: str) -> tuple:
+    """
+    Parse a score string once, results are memoized across calls.
+    Returns (sets, retired, walkover, default), sets being
+    (winner_games, loser_games, tiebreak) tuples, NaN for unreadable games.
+    Example: '7-6(5) 6-4' -> (((7, 6, 5), (6, 4, nan)), False, False, False)
+    """
+    retired, walkover, default = 'RET' in score, 'W/O' in score, 'DEF' in score
+
+    sets = []
+    for s in score.split():
+        s_clean = re.sub(r'\([^)]*\)', '', s)
+        if '-' not in s_clean:
+            continue
+        games = s_clean.split('-')
+        tiebreak = re.search(r'\((\d+)\)', s)
+        sets.append((
+            _to_games(games[0]) if len(games) == 2 else np.nan,
+            _to_games(games[1]) if len(games) == 2 else np.nan,
+            int(tiebreak.group(1)) if tiebreak else np.nan
+        ))
+
+    return tuple(sets), retired, walkover, default
+
+
+def _to_games(games: str) -> float:
+    try:
+        return int(games)
+    except ValueError:
+        return np.nan
+
+
+def parse_scores(scores) -> pd.DataFrame:
+    """One row per set of every distinct score in `scores` (SET_COLUMNS), NaN scores skipped."""
+    distinct = pd.Series(scores, dtype=object).dropna().unique()
+    parsed = [parse_score(score) for score in distinct]
+    n_sets = np.array([len(sets) for sets, *_ in parsed], dtype=int)
+    games = np.array([s for sets, *_ in parsed for s in sets], dtype=float).reshape(-1, 3)
+    flags = np.array([flags for _, *flags in parsed], dtype=bool).reshape(-1, 3)
+    first_rows = np.cumsum(n_sets) - n_sets
+
+    return pd.DataFrame({
+        'score': np.repeat(distinct, n_sets),
+        'set': np.arange(n_sets.sum()) - np.repeat(first_rows, n_sets) + 1,
+        'winner_games': games[:, 0],
+        'loser_games': games[:, 1],
+        'tiebreak': games[:, 2],
+        'retired': np.repeat(flags[:, 0], n_sets),
+        'walkover': np.repeat(flags[:, 1], n_sets),
+        'default': np.repeat(flags[:, 2], n_sets)
+    }, columns=SET_COLUMNS)
+
+
+def get_score_indicators(scores: pd.Series) -> pd.DataFrame:
+    """
+    Per-match indicators of the same index as `scores`, from parse_scores:
+    sets_count, differences, tot_games (as get_games_differences and
+    get_games_sums) and winner_games (as get_winner_games).
+    """
+    codes, distinct = pd.factorize(scores.astype(object))
+    df_sets = parse_scores(distinct)
+    set_codes = pd.Index(distinct).get_indexer(df_sets['score'])
+    completed = ~(df_sets['retired'] | df_sets['walkover'] | df_sets['default']).to_numpy()
+    winner_games = df_sets['winner_games'].to_numpy(dtype=float)
+    loser_games = df_sets['loser_games'].to_numpy(dtype=float)
+
+    def per_score(values):
+        # Unreadable games are skipped, scores without sets count no games
+        return np.bincount(set_codes, weights=np.nan_to_num(values), minlength=len(distinct))
+
+    indicators = np.column_stack([
+        # Number of '-' in the score, as the original sets count
+        [score.count('-') for score in distinct],
+        per_score(np.where(completed, winner_games - loser_games, 0)),
+        per_score(np.where(completed, winner_games + loser_games, 0)),
+        per_score(winner_games)
+    ])
+    # Last row for NaN scores (code -1)
+    indicators = np.vstack([indicators, [np.nan, 0, 0, np.nan]])
+
+    return pd.DataFrame(
+        indicators[codes],
+        index=scores.index,
+        columns=['sets_count', 'differences', 'tot_games', 'winner_games']
+    )
@@ -0,0 +1,155 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ATP matches of input_data/atp_matches_YYYY.csv as one Parquet file per year:
+# match_store/1968.parquet, match_store/1969.parquet, ...
+# Names, surfaces, rounds and levels are dictionary-encoded and the stats are
+# compact ints, so a loader only decodes the few columns it asks for. Every
+# file records the size and modification time of its CSV and is rebuilt from
+# it when they change.
+TENNIS_DIR = Path(__file__).resolve().parent
+INPUT_DIR = TENNIS_DIR / 'input_data'
+MATCH_STORE_DIR = TENNIS_DIR / 'match_store'
+COMPRESSION = 'zstd'
+
+SOURCE_KEY = b'source_csv'
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = pa.schema([
+    ('tourney_id', _CATEGORY),
+    ('tourney_name', _CATEGORY),
+    ('surface', _CATEGORY),
+    ('draw_size', pa.int16()),
+    ('tourney_level', _CATEGORY),
+    ('tourney_date', pa.int32()),
+    ('match_num', pa.int16()),
+    ('winner_id', pa.int32()),
+    ('winner_seed', pa.int8()),
+    ('winner_entry', _CATEGORY),
+    ('winner_name', _CATEGORY),
+    ('winner_hand', _CATEGORY),
+    ('winner_ht', pa.int16()),
+    ('winner_ioc', _CATEGORY),
+    ('winner_age', pa.float64()),
+    ('loser_id', pa.int32()),
+    ('loser_seed', pa.int8()),
+    ('loser_entry', _CATEGORY),
+    ('loser_name', _CATEGORY),
+    ('loser_hand', _CATEGORY),
+    ('loser_ht', pa.int16()),
+    ('loser_ioc', _CATEGORY),
+    ('loser_age', pa.float64()),
+    ('score', pa.string()),
+    ('best_of', pa.int8()),
+    ('round', _CATEGORY),
+    ('minutes', pa.int16()),
+    *[(f'{side}_{stat}', pa.int16()) for side in ('w', 'l') for stat in (
+        'ace', 'df', 'svpt', '1stIn', '1stWon', '2ndWon', 'SvGms', 'bpSaved', 'bpFaced'
+    )],
+    ('winner_rank', pa.int16()),
+    ('winner_rank_points', pa.int32()),
+    ('loser_rank', pa.int16()),
+    ('loser_rank_points', pa.int32()),
+])
+CATEGORICAL_COLUMNS = [field.name for field in SCHEMA if pa.types.is_dictionary(field.type)]
+
+
+# --- PATHS ---
+def _csv_path(year: int, input_dir) -> Path:
+    return Path(input_dir) / f'atp_matches_{year}.csv'
+
+
+def _year_path(year: int, store_dir) -> Path:
+    return Path(store_dir) / f'{year}.parquet'
+
+
+def _source(csv_path: Path) -> dict:
+    stat = csv_path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def get_source_years(input_dir=INPUT_DIR) -> list:
+    return sorted(int(p.stem.split('_')[-1]) for p in Path(input_dir).glob('atp_matches_*.csv'))
+
+
+def get_stored_years(store_dir=MATCH_STORE_DIR) -> list:
+    return sorted(int(p.stem) for p in Path(store_dir).glob('*.parquet'))
+
+
+# --- BUILD ---
+def convert_year(year: int, input_dir=INPUT_DIR, store_dir=MATCH_STORE_DIR):
+    """Write the Parquet file of one year from its CSV, replacing the previous one atomically."""
+    csv_path = _csv_path(year, input_dir)
+    source = _source(csv_path)
+    df = pd.read_csv(csv_path)
+
+    # Sorted categories, so the dictionary-encoded columns group and sort like strings;
+    # NaN stats become nulls of the int columns
+    df = df.astype({column: 'category' for column in CATEGORICAL_COLUMNS})
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    # Without the pandas metadata the ints come back as numpy columns, float where there are nulls, like read_csv
+    table = table.replace_schema_metadata({SOURCE_KEY: json.dumps(source)})
+
+    path = _year_path(year, store_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    pq.write_table(table, tmp_path, compression=COMPRESSION)
+    tmp_path.replace(path)
+
+
+def is_stale(year: int, input_dir=INPUT_DIR, store_dir=MATCH_STORE_DIR) -> bool:
+    """True when the year is not stored or its CSV changed since it was."""
+    path = _year_path(year, store_dir)
+    if not path.exists():
+        return True
+    stored = json.loads(pq.read_schema(path).metadata[SOURCE_KEY])
+    return stored != _source(_csv_path(year, input_dir))
+
+
+def update_store(years=None, input_dir=INPUT_DIR, store_dir=MATCH_STORE_DIR) -> list:
+    """Convert the CSVs of `years` (all by default) that are new or changed, return the converted years."""
+    source_years = get_source_years(input_dir)
+    if years is not None:
+        years = set(years)
+        source_years = [year for year in source_years if year in years]
+    else:
+        # Years whose CSV was removed
+        for year in set(get_stored_years(store_dir)) - set(source_years):
+            _year_path(year, store_dir).unlink()
+
+    converted = [year for year in source_years if is_stale(year, input_dir, store_dir)]
+    for year in converted:
+        convert_year(year, input_dir, store_dir)
+    return converted
+
+
+# --- READ ---
+def read_matches(columns=None, years=None, levels=None, input_dir=INPUT_DIR, store_dir=MATCH_STORE_DIR) -> pd.DataFrame:
+    """
+    Matches of `years` (all by default) restricted to `columns`, and to the
+    tourney levels of `levels` when given. The store is brought up to date
+    with the CSVs of these years first; only their files are opened, and the
+    level filter is applied while reading them.
+    """
+    if years is not None:
+        years = set(years)
+    update_store(years, input_dir, store_dir)
+    stored_years = get_stored_years(store_dir)
+    if years is not None:
+        stored_years = [year for year in stored_years if year in years]
+
+    filters = [('tourney_level', 'in', list(levels))] if levels is not None else None
+    frames = [pd.read_parquet(_year_path(year, store_dir), columns=columns, filters=filters) for year in stored_years]
+    if not frames:
+        return pd.DataFrame(columns=columns or SCHEMA.names)
+    if len(frames) == 1:
+        return frames[0]
+    # Each file has its own categories, union them so the columns stay categorical
+    return pd.concat(frames, ignore_index=True).astype({
+        column: 'category' for column in CATEGORICAL_COLUMNS if columns is None or column in columns
+    })
@@ -1,12 +1,24 @@
 import pandas as pd
 import numpy as np
 import glob
-from second_serve_helpers import compute_second_serve_metrics, get_all_players
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from second_serve_helpers import compute_second_serve_tables
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from match_store import read_matches
 
 # --- CONFIG ---
 INPUT_PATH = '../input_data/'
 OUTPUT_PATH = 'output_data/'
 START_YEAR = 1991
+# Process the years across a pool of processes, MAX_WORKERS=None for one per core
+PARALLEL = False
+MAX_WORKERS = None
+# Columns read from the match store
+COLUMNS = ['surface', 'winner_name', 'loser_name', 'w_1stWon', 'w_2ndWon', 'l_1stWon', 'l_2ndWon']
 
 
 # --- LOAD ALL FILES ---
@@ -24,54 +36,35 @@ def load_all_years(start_year: int):
 
 # --- PROCESS ONE YEAR ---
 def process_year(year: int, file: str):
-    df = pd.read_csv(file)
-
-    overall_rows = []
-    surface_rows = []
-
-    players = get_all_players(df)
-
-    for player in players:
-        # --- OVERALL ---
-        metrics = compute_second_serve_metrics(df, player)
-        if metrics is None:
-            continue
-
-        overall_rows.append({
-            'year': year,
-            'player': player,
-            **metrics
-        })
-
-        # --- BY SURFACE ---
-        for surface, df_surface in df.groupby('surface'):
-            metrics_surface = compute_second_serve_metrics(df_surface, player)
-            if metrics_surface is None:
-                continue
-
-            surface_rows.append({
-                'year': year,
-                'player': player,
-                'surface': surface,
-                **metrics_surface
-            })
+    df = read_matches(COLUMNS, years=[year], input_dir=Path(file).parent)
+
+    # --- OVERALL + BY SURFACE ---
+    overall, by_surface = compute_second_serve_tables(df)
 
     return (
-        pd.DataFrame(overall_rows),
-        pd.DataFrame(surface_rows)
+        overall.reset_index().assign(year=year)[['year', 'player', *overall.columns]],
+        by_surface.reset_index().assign(year=year)[['year', 'player', 'surface', *by_surface.columns]]
     )
 
 
 # --- MULTI-YEAR WRAPPER ---
-def process_all_years(start_year: int):
+def process_all_years(start_year: int, parallel: bool = PARALLEL, max_workers: int = MAX_WORKERS):
     overall_all = []
     surface_all = []
 
     year_files = load_all_years(start_year)
-
-    for year, file in year_files:
-        print(f"Processing {year}...")
-        overall_df, surface_df = process_year(year, file)
+    years = [year for year, _ in year_files]
+    files = [file for _, file in year_files]
+
+    if parallel:
+        # map returns the years in order, the output is the same as the serial one
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process_year, years, files))
+    else:
+        results = (process_year(year, file) for year, file in year_files)
+
+    for year, (overall_df, surface_df) in zip(years, results):
+        print(f"Processed {year}")
 
         overall_all.append(overall_df)
         surface_all.append(surface_df)
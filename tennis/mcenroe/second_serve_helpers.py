@@ -51,3 +51,74 @@ def compute_second_serve_metrics(df: pd.DataFrame, player: str) -> dict:
 def get_all_players(df: pd.DataFrame) -> set:
     """Return set of all players appearing in the dataframe."""
     return set(df['winner_name']).union(set(df['loser_name']))
+
+
+# --- PLAYER-SIDE ENGINE ---
+def get_player_matches(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stack the winner and loser sides of every match into one row per player and match,
+    with the player's (own_*) and the opponent's (opp_*) serve points won.
+    """
+    sides = []
+    for player, own, opp, won in (('winner_name', 'w', 'l', True), ('loser_name', 'l', 'w', False)):
+        sides.append(pd.DataFrame({
+            'player': df[player].astype(object),
+            'surface': df['surface'],
+            'won': won,
+            'own_1stWon': df[f'{own}_1stWon'],
+            'opp_1stWon': df[f'{opp}_1stWon'],
+            'own_2ndWon': df[f'{own}_2ndWon'],
+            'opp_2ndWon': df[f'{opp}_2ndWon']
+        }))
+    return pd.concat(sides, ignore_index=True)
+
+
+def _metrics_from_sums(sums: pd.DataFrame, counts: pd.DataFrame) -> pd.DataFrame:
+    """compute_second_serve_metrics of every group from the sums and counts of its player-match rows."""
+    matches_w = sums['won']
+    matches_l = sums['lost']
+    matches_tot = matches_w + matches_l
+
+    perc_2nd_w = sums['own_2nd_w'] / counts['own_2nd_w']
+    perc_2nd_l = sums['own_2nd_l'] / counts['own_2nd_l']
+
+    return pd.DataFrame({
+        'matches_tot': matches_tot,
+        'matches_w': matches_w,
+        # NaN as soon as one of the two means is (no lost match, or no stats for them)
+        'perc_2nd_overall': (perc_2nd_w * matches_w + perc_2nd_l * matches_l) / matches_tot,
+        'perc_2nd_w': perc_2nd_w,
+        'margin_2nd_w': (perc_2nd_w - sums['opp_2nd_w'] / counts['opp_2nd_w']).where(matches_w > 0),
+        'matches_2nd_w': sums['won_2nd']
+    })
+
+
+def compute_second_serve_tables(df: pd.DataFrame):
+    """
+    compute_second_serve_metrics of every player of the year, overall and per surface,
+    from one groupby of the player-match table. Returns the overall table indexed by
+    player and the surface table indexed by (player, surface).
+    """
+    df_players = get_player_matches(df)
+    won = df_players['won']
+    values = pd.DataFrame({
+        'won': won,
+        'lost': ~won,
+        'own_2nd_w': df_players['own_2ndWon'].where(won),
+        'own_2nd_l': df_players['own_2ndWon'].where(~won),
+        'opp_2nd_w': df_players['opp_2ndWon'].where(won),
+        # Matches won thanks to second serve
+        'won_2nd': won
+        & (df_players['own_1stWon'] <= df_players['opp_1stWon'])
+        & (df_players['own_2ndWon'] > df_players['opp_2ndWon'])
+    })
+
+    # Matches without surface only count overall
+    grouped = values.groupby([df_players['player'], df_players['surface']], observed=True, dropna=False)
+    sums, counts = grouped.sum(), grouped.count()
+
+    overall = _metrics_from_sums(sums.groupby(level='player').sum(), counts.groupby(level='player').sum())
+    has_surface = sums.index.get_level_values('surface').notna()
+    by_surface = _metrics_from_sums(sums[has_surface], counts[has_surface])
+
+    return overall, by_surface
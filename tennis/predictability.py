@@ -1,195 +1,212 @@
 import pandas as pd
 import numpy as np
-from helpers import get_games_differences, get_games_sums, get_winner_games
+from concurrent.futures import ProcessPoolExecutor
+from helpers import get_score_indicators
+from match_store import read_matches
 
 # --- CONFIG ---
 path = 'input_data/'
 output_path = 'output_data/'
 tournament_types = ['G', 'M']
 tournament_rounds = ['R16', 'QF', 'SF', 'F']
+# Process the years across a pool of processes, max_workers=None for one per core
+parallel = False
+max_workers = None
 
 
 # --- LOAD DATASET ---
-def load_dataset(year: int) -> pd.DataFrame:
+def load_dataset(year: int, columns: list = None) -> pd.DataFrame:
     """Load ATP matches for the given year, filtered to Grand Slams and Masters 1000."""
-    df = pd.read_csv(path + f'atp_matches_{year}.csv')
-    df_filtered = df.loc[df['tourney_level'].isin(tournament_types)]
-    return df_filtered
+    return read_matches(columns, years=[year], levels=tournament_types, input_dir=path)
 
 
 # --- COMPUTE ROUND METRICS ---
-def compute_indicators(df: pd.DataFrame):
-    """Compute base indicators for a tournament or round."""
-    if df.empty:
-        return 0, np.nan, np.nan, np.nan, np.nan
+metrics_keys = [
+    'avg_sets',
+    'avg_diff_games',
+    'avg_tot_games',
+    'avg_rank',
+    'fave_ratio'
+]
 
-    df = df.copy()
-    df['sets_count'] = df['score'].str.count('-')
-    df['differences'] = df['score'].apply(get_games_differences)
-    df['tot_games'] = df['score'].apply(get_games_sums)
-    df['winner_games'] = df['score'].apply(get_winner_games)
 
-    avg_sets = df['sets_count'].mean()
-    avg_diff_games = df['differences'].mean()
-    avg_tot_games = df['tot_games'].mean()
-    avg_rank = df['winner_rank'].mean()
-    fave_ratio = (df['winner_rank'] < df['loser_rank']).mean()
+def compute_indicators(df: pd.DataFrame):
+    """
+    Base indicators of every tournament of the year, overall and per round, in one pass.
+    Returns the sorted tourney ids and an array of shape (tournaments, 1 + rounds, indicators):
+    slot 0 is the whole tournament, slot i the i-th of tournament_rounds.
+    """
+    tourney_codes, tourney_ids = pd.factorize(df['tourney_id'], sort=True)
+    n_slots = 1 + len(tournament_rounds)
+    round_slots = pd.Index(tournament_rounds).get_indexer(df['round']) + 1
+    in_rounds = round_slots > 0
+    # Every match counts for its tournament, and for its round when it is one of tournament_rounds
+    keys = np.concatenate([tourney_codes * n_slots, (tourney_codes * n_slots + round_slots)[in_rounds]])
+    n_keys = len(tourney_ids) * n_slots
+
+    values = np.column_stack([
+        df['sets_count'],
+        df['differences'],
+        df['tot_games'],
+        df['winner_rank'],
+        df['winner_rank'] < df['loser_rank']
+    ]).astype(float)
+    values = np.concatenate([values, values[in_rounds]])
+
+    valid = ~np.isnan(values)
+    sums = np.column_stack([
+        np.bincount(keys, weights=np.where(valid[:, i], values[:, i], 0), minlength=n_keys)
+        for i in range(values.shape[1])
+    ])
+    counts = np.column_stack([np.bincount(keys, weights=valid[:, i], minlength=n_keys) for i in range(values.shape[1])])
+    with np.errstate(invalid='ignore'):
+        means = sums / counts
 
-    return avg_sets, avg_diff_games, avg_tot_games, avg_rank, fave_ratio
+    # Rounds a tournament did not play have no metrics, but 0 sets
+    played = np.bincount(keys, minlength=n_keys) > 0
+    means[~played, 0] = 0
+
+    return tourney_ids, means.reshape(len(tourney_ids), n_slots, len(metrics_keys))
 
 
 # --- TOURNAMENT METRICS (overall + per round) ---
 def get_tournament_metrics(df: pd.DataFrame):
-    """Compute overall and per-round metrics for a tournament."""
-    round_metrics = {}
-
-    overall_metrics_keys = [
-        'avg_sets',
-        'avg_diff_games',
-        'avg_tot_games',
-        'avg_rank',
-        'fave_ratio'
-    ]
-
-    overall_values = compute_indicators(df)
-    overall_metrics = dict(zip(overall_metrics_keys, overall_values))
-
-    for rnd in tournament_rounds:
-        r_metrics = compute_indicators(df[df['round'] == rnd])
-        round_metrics.update({
-            f'{k}_{rnd}': v
-            for k, v in zip(overall_metrics_keys, r_metrics)
-        })
+    """Compute overall and per-round metrics of every tournament, indexed by tourney_id."""
+    tourney_ids, means = compute_indicators(df)
+    index = pd.Index(tourney_ids, name='tourney_id')
+
+    overall_metrics = pd.DataFrame(means[:, 0], index=index, columns=metrics_keys)
+    round_metrics = pd.DataFrame(
+        means[:, 1:].reshape(len(index), -1),
+        index=index,
+        columns=[f'{k}_{rnd}' for rnd in tournament_rounds for k in metrics_keys]
+    )
 
     return overall_metrics, round_metrics
 
 
 # --- PREDICTABILITY METRICS ---
-def compute_predictability(metrics: dict):
+def compute_predictability(metrics: pd.DataFrame):
     avg_winner_rank = np.nanmean([
-        metrics.get('avg_rank_R16'),
-        metrics.get('avg_rank_QF'),
-        metrics.get('avg_rank_SF'),
-        metrics.get('avg_rank_F')
-    ])
+        metrics['avg_rank_R16'],
+        metrics['avg_rank_QF'],
+        metrics['avg_rank_SF'],
+        metrics['avg_rank_F']
+    ], axis=0)
 
     rank_drop = (
-        (metrics.get('avg_rank_F') - metrics.get('avg_rank_R16'))
-        / metrics.get('avg_rank_R16')
-        if metrics.get('avg_rank_R16') else np.nan
-    )
+        (metrics['avg_rank_F'] - metrics['avg_rank_R16'])
+        / metrics['avg_rank_R16']
+    ).where(metrics['avg_rank_R16'] != 0)
 
     avg_fave_ratio = np.nanmean([
-        metrics.get('fave_ratio_R16'),
-        metrics.get('fave_ratio_QF'),
-        metrics.get('fave_ratio_SF'),
-        metrics.get('fave_ratio_F')
-    ])
+        metrics['fave_ratio_R16'],
+        metrics['fave_ratio_QF'],
+        metrics['fave_ratio_SF'],
+        metrics['fave_ratio_F']
+    ], axis=0)
 
     return avg_winner_rank, rank_drop, avg_fave_ratio
 
 
 # --- COMPETITIVENESS METRICS ---
-def compute_competitiveness(metrics: dict):
-    tourney_level = metrics.get('tourney_level', 'G')
-    n_sets = 5 if tourney_level == 'G' else 3
+def compute_competitiveness(metrics: pd.DataFrame):
+    n_sets = np.where(metrics['tourney_level'] == 'G', 5, 3)
     max_games = 13 * n_sets
 
     match_tightness = np.nanmean([
-        metrics.get('avg_tot_games_R16') / max_games,
-        metrics.get('avg_tot_games_QF') / max_games,
-        metrics.get('avg_tot_games_SF') / max_games,
-        metrics.get('avg_tot_games_F') / max_games
-    ])
+        metrics['avg_tot_games_R16'] / max_games,
+        metrics['avg_tot_games_QF'] / max_games,
+        metrics['avg_tot_games_SF'] / max_games,
+        metrics['avg_tot_games_F'] / max_games
+    ], axis=0)
 
     match_balance = 1 - np.nanmean([
-        metrics.get('avg_diff_games_R16') / metrics.get('avg_tot_games_R16'),
-        metrics.get('avg_diff_games_QF') / metrics.get('avg_tot_games_QF'),
-        metrics.get('avg_diff_games_SF') / metrics.get('avg_tot_games_SF'),
-        metrics.get('avg_diff_games_F') / metrics.get('avg_tot_games_F')
-    ])
+        metrics['avg_diff_games_R16'] / metrics['avg_tot_games_R16'],
+        metrics['avg_diff_games_QF'] / metrics['avg_tot_games_QF'],
+        metrics['avg_diff_games_SF'] / metrics['avg_tot_games_SF'],
+        metrics['avg_diff_games_F'] / metrics['avg_tot_games_F']
+    ], axis=0)
 
     return match_tightness, match_balance
 
 
 # --- AGGREGATE TOURNAMENT SCORE ---
-def get_tournament_scores(metrics: dict):
+def get_tournament_scores(metrics: pd.DataFrame):
     avg_winner_rank, rank_drop, avg_fave_ratio = compute_predictability(metrics)
     match_tightness, match_balance = compute_competitiveness(metrics)
 
-    return {
+    return pd.DataFrame({
         'avg_winner_rank': avg_winner_rank,
         'rank_drop': rank_drop,
         'avg_fave_ratio': avg_fave_ratio,
         'match_tightness': match_tightness,
         'match_balance': match_balance
-    }
+    }, index=metrics.index)
 
 
 # --- PROCESS ONE YEAR ---
-def process_year(year: int):
-    df_year = load_dataset(year)
-
-    overall_results = []
-    round_results = []
-
-    for tourney_id, df_tournament in df_year.groupby('tourney_id'):
-        tourney_name = df_tournament['tourney_name'].iloc[0]
-        tourney_level = df_tournament['tourney_level'].iloc[0]
-        surface = df_tournament['surface'].iloc[0]
+year_columns = [
+    'tourney_id',
+    'tourney_name',
+    'surface',
+    'tourney_level',
+    'round',
+    'score',
+    'winner_rank',
+    'loser_rank'
+]
 
-        df_tournament = df_tournament.copy()
-        df_tournament['winner_games'] = df_tournament['score'].apply(get_winner_games)
 
-        avg_winner_games = df_tournament['winner_games'].mean()
+def process_year(year: int):
+    df_year = load_dataset(year, year_columns)
+    # Every distinct score of the year is parsed once
+    df_year = df_year.join(get_score_indicators(df_year['score']))
 
-        final_match = df_tournament[df_tournament['round'] == 'F']
-        final_winner_rank = (
-            final_match['winner_rank'].iloc[0]
-            if not final_match.empty
-            else np.nan
-        )
+    overall_metrics, round_metrics = get_tournament_metrics(df_year)
 
-        overall_metrics, round_metrics = get_tournament_metrics(df_tournament)
+    tournaments = (
+        df_year.drop_duplicates('tourney_id')
+        .set_index('tourney_id')
+        .reindex(overall_metrics.index)
+    )
+    info = pd.DataFrame({
+        'year': year,
+        'tournament': tournaments['tourney_name'],
+        'surface': tournaments['surface'],
+        'tourney_level': tournaments['tourney_level']
+    })
 
-        metrics = {
-            **overall_metrics,
-            **round_metrics,
-            'tourney_level': tourney_level
-        }
+    scores = get_tournament_scores(round_metrics.assign(tourney_level=info['tourney_level']))
 
-        scores = get_tournament_scores(metrics)
+    avg_winner_games = df_year.groupby('tourney_id')['winner_games'].mean()
 
-        overall_results.append({
-            'year': year,
-            'tournament': tourney_name,
-            'surface': surface,
-            'tourney_level': tourney_level,
-            **overall_metrics,
-            **scores,
-            'avg_winner_games': avg_winner_games,
-            'final_winner_rank': final_winner_rank
-        })
+    final_match = df_year[df_year['round'] == 'F'].drop_duplicates('tourney_id')
+    final_winner_rank = final_match.set_index('tourney_id')['winner_rank']
 
-        round_results.append({
-            'year': year,
-            'tournament': tourney_name,
-            'surface': surface,
-            'tourney_level': tourney_level,
-            **round_metrics
-        })
+    overall_df = pd.concat([info, overall_metrics, scores], axis=1).assign(
+        avg_winner_games=avg_winner_games,
+        final_winner_rank=final_winner_rank.reindex(overall_metrics.index)
+    )
+    rounds_df = pd.concat([info, round_metrics], axis=1)
 
-    return pd.DataFrame(overall_results), pd.DataFrame(round_results)
+    return overall_df.reset_index(drop=True), rounds_df.reset_index(drop=True)
 
 
 # --- MULTI-YEAR WRAPPER ---
-def process_multiple_years(years: list):
+def process_multiple_years(years: list, parallel: bool = parallel, max_workers: int = max_workers):
     all_overall = []
     all_rounds = []
 
-    for year in years:
-        print(f"Processing {year}...")
-        overall_df, rounds_df = process_year(year)
+    if parallel:
+        # map returns the years in order, the output is the same as the serial one
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process_year, years))
+    else:
+        results = (process_year(year) for year in years)
+
+    for year, (overall_df, rounds_df) in zip(years, results):
+        print(f"Processed {year}")
         all_overall.append(overall_df)
         all_rounds.append(rounds_df)
 